@@ -1,29 +1,84 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import contextlib
 import logging
+import multiprocessing
 import os
-import subprocess
 import sys
+import time
+import traceback
 import uuid
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Callable
 
-from fastapi import FastAPI
+import orjson
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from prometheus_fastapi_instrumentator import Instrumentator
 
-app = FastAPI(title="EDA Runner")
+try:  # the image copies the pipelines next to this module (see Dockerfile)
+    import eda as eda_pipeline
+    import evaluate as evaluate_pipeline
+    import train as train_pipeline
+except ModuleNotFoundError:  # pragma: no cover - running from the repository root
+    from ml.pipelines import eda as eda_pipeline
+    from ml.pipelines import evaluate as evaluate_pipeline
+    from ml.pipelines import train as train_pipeline
+
+# orjson also encodes NaN statistics in EDA summaries (as null), which the
+# default JSONResponse rejects.
+app = FastAPI(title="EDA Runner", default_response_class=ORJSONResponse)
+
+
+# Same formatter as app/inference-service/main.py: the inference image's build
+# context is app/inference-service alone (build-inference.yml), so the two
+# services cannot import a shared module.
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, encoded by orjson.
+
+    Fields passed through :func:`log_event` are merged at the top level;
+    plain records (uvicorn, libraries) keep their text under ``msg``.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {"time": self.formatTime(record), "level": record.levelname, "logger": record.name}
+        fields = getattr(record, "fields", None)
+        if fields is not None:
+            payload.update(fields)
+        else:
+            payload["msg"] = record.getMessage()
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return orjson.dumps(payload, default=str).decode()
+
 
 handler = logging.StreamHandler(sys.stdout)
-formatter = logging.Formatter(
-    '{"time":"%(asctime)s","level":"%(levelname)s","msg":"%(message)s","logger":"%(name)s"}'
-)
-handler.setFormatter(formatter)
+handler.setFormatter(JsonFormatter())
 logging.getLogger().handlers = [handler]
 logging.getLogger().setLevel(logging.INFO)
 LOGGER = logging.getLogger("eda-train-worker")
 
 
+def log_event(event: str, level: int = logging.INFO, **fields: Any) -> None:
+    # Skip building the payload entirely when the level is filtered out.
+    if LOGGER.isEnabledFor(level):
+        LOGGER.log(level, event, extra={"fields": {"event": event, **fields}})
+
+
+CURRENT_METRICS_PATH = "/models/current/metrics.json"
+# Each spawned worker imports the three pipelines (~220 MB RSS); one EDA and
+# one training worker next to this process fit the 1 CPU / 1Gi pod limits.
+POOL_SIZES = {
+    "eda": int(os.getenv("EDA_WORKERS", "1")),
+    "train": int(os.getenv("TRAIN_WORKERS", "1")),
+}
+EXECUTORS: dict[str, ProcessPoolExecutor] = {}
+
+
 class EdaRequest(BaseModel):
     dataset_path: str
     output_path: str = "/out"
@@ -36,10 +91,123 @@ class RetrainRequest(BaseModel):
     params: dict | None = None
 
 
+def _new_executor(name: str) -> ProcessPoolExecutor:
+    # "spawn" keeps children from inheriting (and copying on write) this
+    # process' heap; training gets its own pool so it never queues behind EDA.
+    ctx = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=POOL_SIZES[name], mp_context=ctx)
+    EXECUTORS[name] = executor
+    return executor
+
+
 @app.on_event("startup")
 async def _startup() -> None:
     Instrumentator().instrument(app).expose(app, endpoint="/metrics", include_in_schema=False)
-    LOGGER.info(json.dumps({"event": "WORKER_STARTED"}))
+    for name in POOL_SIZES:
+        _new_executor(name)
+    log_event("WORKER_STARTED")
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    for executor in EXECUTORS.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run_in_pool(name: str, func: Callable[..., Any], *args: Any) -> Any:
+    """Run ``func`` in the named pool, replacing the pool if a worker died.
+
+    A worker killed mid-job (e.g. OOM) leaves the executor broken for every
+    later submit; the pool is recreated so only the affected requests fail.
+    """
+
+    executor = EXECUTORS[name]
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+    except BrokenProcessPool as exc:
+        # Concurrent requests share the broken pool; only the first replaces it.
+        if EXECUTORS.get(name) is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            _new_executor(name)
+            log_event("POOL_RECREATED", level=logging.ERROR, pool=name, error=str(exc))
+        raise HTTPException(status_code=503, detail=f"{name} worker process died") from exc
+
+
+def _tail(path: str, limit: int) -> str:
+    """Return the last ``limit`` bytes of ``path`` without reading the whole file."""
+
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(size - limit, 0))
+        return f.read().decode("utf-8", errors="replace")
+
+
+def _run_step(
+    func: Callable[..., Any], *args: Any, log_prefix: str, tail: int
+) -> tuple[int, str, str, Any]:
+    """Run a pipeline step in-process, streaming what it prints to log files.
+
+    Output goes to ``<log_prefix>stdout.log``/``<log_prefix>stderr.log`` so
+    memory stays bounded however chatty the step is; only the last ``tail``
+    bytes of each are returned as ``(returncode, stdout, stderr, result)``,
+    the shape responses had when each step was a separate ``python`` process.
+    """
+
+    stdout_path, stderr_path = f"{log_prefix}stdout.log", f"{log_prefix}stderr.log"
+    returncode, result = 0, None
+    with open(stdout_path, "w", encoding="utf-8") as stdout, open(
+        stderr_path, "w", encoding="utf-8"
+    ) as stderr, contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            result = func(*args)
+        except SystemExit as exc:
+            if isinstance(exc.code, int):
+                returncode = exc.code
+            elif exc.code is not None:
+                returncode = 1
+                print(exc.code, file=sys.stderr)
+        except Exception:
+            returncode = 1
+            traceback.print_exc()
+    return returncode, _tail(stdout_path, tail), _tail(stderr_path, tail), result
+
+
+def _do_eda(dataset_path: str, outdir: str, outliers_col: str) -> tuple[int, str, str, Any]:
+    # The run directory is created here: /out is a network volume
+    # and the handlers must not block the event loop on it.
+    os.makedirs(outdir, exist_ok=True)
+    return _run_step(
+        eda_pipeline.run,
+        dataset_path,
+        outdir,
+        outliers_col,
+        log_prefix=f"{outdir}/",
+        tail=1000,
+    )
+
+
+def _do_retrain(
+    dataset_path: str, outdir: str, params: dict | None
+) -> tuple[tuple[int, str, str, Any], tuple[int, str, str, Any]]:
+    os.makedirs(outdir, exist_ok=True)
+    config = train_pipeline.TrainConfig(
+        dataset=Path(dataset_path),
+        outdir=Path(outdir),
+        params=params,
+        export_format="onnx",  # the inference service loads model.onnx by default
+    )
+    train_step = _run_step(
+        train_pipeline.run, config, log_prefix=f"{outdir}/train-", tail=2000
+    )
+    eval_step = _run_step(
+        evaluate_pipeline.run,
+        f"{outdir}/metrics.json",
+        CURRENT_METRICS_PATH,
+        f"{outdir}/compare.json",
+        log_prefix=f"{outdir}/evaluate-",
+        tail=2000,
+    )
+    return train_step, eval_step
 
 
 @app.get("/healthz")
@@ -48,141 +216,63 @@ def healthz() -> dict[str, str]:
 
 
 @app.post("/eda/run")
-def run_eda(req: EdaRequest):
+async def run_eda(req: EdaRequest):
     run_id = str(uuid.uuid4())[:8]
     outdir = os.path.join(req.output_path, run_id)
-    os.makedirs(outdir, exist_ok=True)
-
-    LOGGER.info(
-        json.dumps(
-            {
-                "event": "EDA_RUN_STARTED",
-                "runId": run_id,
-                "datasetPath": req.dataset_path,
-                "outputDir": outdir,
-            }
-        )
-    )
 
-    cmd = [
-        "python",
-        "/app/eda.py",
-        "--input",
-        req.dataset_path,
-        "--output",
-        outdir,
-        "--outliers-col",
-        req.outliers_col,
-    ]
-
-    process = subprocess.run(cmd, capture_output=True, text=True)
-    status = "SUCCESS" if process.returncode == 0 else "FAILED"
+    log_event("EDA_RUN_STARTED", runId=run_id, datasetPath=req.dataset_path, outputDir=outdir)
 
-    summary = {}
-    if status == "SUCCESS":
-        summary_path = os.path.join(outdir, "eda-summary.json")
-        try:
-            with open(summary_path, encoding="utf-8") as f:
-                summary = json.load(f)
-        except Exception:
-            summary = {}
-
-    LOGGER.info(
-        json.dumps(
-            {
-                "event": "EDA_RUN_COMPLETED",
-                "runId": run_id,
-                "status": status,
-                "outputDir": outdir,
-            }
-        )
+    returncode, stdout, stderr, summary = await _run_in_pool(
+        "eda", _do_eda, req.dataset_path, outdir, req.outliers_col
     )
+    status = "SUCCESS" if returncode == 0 else "FAILED"
+    summary = summary or {}
+
+    log_event("EDA_RUN_COMPLETED", runId=run_id, status=status, outputDir=outdir)
 
     return {
         "runId": run_id,
         "status": status,
-        "stdout": process.stdout[-1000:],
-        "stderr": process.stderr[-1000:],
+        "stdout": stdout,
+        "stderr": stderr,
         "summary": summary,
     }
 
 
 @app.post("/train/retrain")
-def retrain(req: RetrainRequest):
-    run_id = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+async def retrain(req: RetrainRequest):
+    # Hex epoch keeps run ids sortable; the suffix avoids same-second collisions.
+    run_id = f"{int(time.time()):x}-{uuid.uuid4().hex[:6]}"
     outdir = os.path.join(req.out_prefix, "retrain", run_id)
-    os.makedirs(outdir, exist_ok=True)
 
-    LOGGER.info(
-        json.dumps(
-            {
-                "event": "RETRAIN_STARTED",
-                "runId": run_id,
-                "datasetPath": req.dataset_path,
-                "outPrefix": req.out_prefix,
-            }
-        )
+    log_event(
+        "RETRAIN_STARTED",
+        runId=run_id,
+        datasetPath=req.dataset_path,
+        outPrefix=req.out_prefix,
     )
 
-    train_cmd = [
-        "python",
-        "/app/train.py",
-        "--dataset",
-        req.dataset_path,
-        "--outdir",
-        outdir,
-    ]
-    if req.params:
-        train_cmd.extend(["--params", json.dumps(req.params)])
-
-    eval_cmd = [
-        "python",
-        "/app/evaluate.py",
-        "--candidate",
-        f"{outdir}/metrics.json",
-        "--current",
-        "/models/current/metrics.json",
-        "--out",
-        f"{outdir}/compare.json",
-    ]
-
-    train_proc = subprocess.run(train_cmd, capture_output=True, text=True)
-    eval_proc = subprocess.run(eval_cmd, capture_output=True, text=True)
-
-    improved = False
-    compare_path = os.path.join(outdir, "compare.json")
-    if os.path.exists(compare_path):
-        try:
-            with open(compare_path, encoding="utf-8") as f:
-                compare = json.load(f)
-            improved = bool(compare.get("improved", False))
-        except Exception:
-            improved = False
-
-    status = "SUCCESS" if train_proc.returncode == 0 else "FAILED"
-    LOGGER.info(
-        json.dumps(
-            {
-                "event": "RETRAIN_COMPLETED",
-                "runId": run_id,
-                "status": status,
-                "outdir": outdir,
-                "improved": improved,
-            }
-        )
+    train_step, eval_step = await _run_in_pool(
+        "train", _do_retrain, req.dataset_path, outdir, req.params
     )
+    train_rc, train_stdout, train_stderr, _ = train_step
+    eval_rc, eval_stdout, eval_stderr, compare = eval_step
+    improved = bool((compare or {}).get("improved", False))
+
+    status = "SUCCESS" if train_rc == 0 else "FAILED"
+    log_event("RETRAIN_COMPLETED", runId=run_id, status=status, outdir=outdir, improved=improved)
     return {
         "runId": run_id,
         "status": status,
         "improved": improved,
         "train": {
-            "returncode": train_proc.returncode,
-            "stdout": train_proc.stdout[-2000:],
-            "stderr": train_proc.stderr[-2000:],
+            "returncode": train_rc,
+            "stdout": train_stdout,
+            "stderr": train_stderr,
         },
         "evaluate": {
-            "returncode": eval_proc.returncode,
-            "stdout": eval_proc.stdout[-2000:],
-            "stderr": eval_proc.stderr[-2000:],
+            "returncode": eval_rc,
+            "stdout": eval_stdout,
+            "stderr": eval_stderr,
         },
     }
@@ -1,44 +1,88 @@
+import asyncio
+import functools
 import os
 import json
 import logging
 import sys
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from urllib.parse import urlparse
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 import joblib
 import numpy as np
 import onnxruntime as ort
+import orjson
 from botocore.exceptions import BotoCoreError, ClientError
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from prometheus_fastapi_instrumentator import Instrumentator
 
-app = FastAPI(title="Inference Service")
+app = FastAPI(title="Inference Service", default_response_class=ORJSONResponse)
+
+
+# Same formatter as app/eda-train-worker/main.py: the inference image's build
+# context is app/inference-service alone (build-inference.yml), so the two
+# services cannot import a shared module.
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, encoded by orjson.
+
+    Fields passed through :func:`log_event` are merged at the top level;
+    plain records (uvicorn, libraries) keep their text under ``msg``.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {"time": self.formatTime(record), "level": record.levelname, "logger": record.name}
+        fields = getattr(record, "fields", None)
+        if fields is not None:
+            payload.update(fields)
+        else:
+            payload["msg"] = record.getMessage()
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return orjson.dumps(payload, default=str).decode()
+
 
 handler = logging.StreamHandler(sys.stdout)
-formatter = logging.Formatter(
-    '{"time":"%(asctime)s","level":"%(levelname)s","msg":"%(message)s","logger":"%(name)s"}'
-)
-handler.setFormatter(formatter)
+handler.setFormatter(JsonFormatter())
 logging.getLogger().handlers = [handler]
 logging.getLogger().setLevel(logging.INFO)
 LOGGER = logging.getLogger("inference-service")
 
+
+def log_event(event: str, level: int = logging.INFO, **fields: Any) -> None:
+    # Skip building the payload entirely when the level is filtered out.
+    if LOGGER.isEnabledFor(level):
+        LOGGER.log(level, event, extra={"fields": {"event": event, **fields}})
+
+
 MODEL_SOURCE_PATH = os.getenv("MODEL_PATH", "/models/model.onnx")
 MODEL_PATH = MODEL_SOURCE_PATH
 MODEL_FORMAT = os.getenv("MODEL_FORMAT", "onnx")
+IS_ONNX = MODEL_FORMAT.lower() == "onnx"
 MODEL_META_PATH = os.getenv("MODEL_META_PATH", "")
+MODEL_QUANT = os.getenv("MODEL_QUANT", "").lower()
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "1"))
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    max_concurrency=int(os.getenv("S3_CONCURRENCY", "8")),
+    use_threads=True,
+)
 READY = False
 ORT_SESSION = None
+INPUT_NAME = ""
+OUTPUT_NAME = ""
 PKL_MODEL = None
 SCALER = None
-FEATURE_ORDER: List[str] = []
-
-
-class PredictRequest(BaseModel):
-    records: List[Dict[str, Any]]
+FEATURE_ORDER: Tuple[str, ...] = ()
+N_FEATURES = 0
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "0"))
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "1024"))
+PENDING: "asyncio.Queue[Tuple[np.ndarray, asyncio.Future]] | None" = None
+BATCHER: "asyncio.Task | None" = None
 
 
 class Health(BaseModel):
@@ -48,27 +92,45 @@ class Health(BaseModel):
 
 
 def load_aux() -> None:
-    global FEATURE_ORDER
+    global FEATURE_ORDER, N_FEATURES
     meta = os.getenv("FEATURES_JSON", MODEL_META_PATH)
     if meta and os.path.exists(meta):
         try:
             with open(meta) as f:
                 data = json.load(f)
-            FEATURE_ORDER[:] = data.get("feature_order", [])
+            FEATURE_ORDER = tuple(data.get("feature_order", []))
         except Exception:
-            FEATURE_ORDER = []
+            FEATURE_ORDER = ()
+    N_FEATURES = len(FEATURE_ORDER)
 
 
 def to_matrix(records: List[Dict[str, Any]]) -> np.ndarray:
-    if FEATURE_ORDER:
-        return np.array(
-            [[rec.get(key, 0) for key in FEATURE_ORDER] for rec in records],
-            dtype=float,
-        )
-    keys = sorted({key for record in records for key in record.keys()})
-    return np.array(
-        [[rec.get(key, 0) for key in keys] for rec in records],
-        dtype=float,
+    """Project records onto the feature order as one contiguous float32 matrix.
+
+    Values are streamed straight into the final buffer instead of building a
+    list of lists first, and the dtype already matches what ONNX expects.
+    """
+
+    keys, n_keys = FEATURE_ORDER, N_FEATURES
+    if not keys:
+        keys = sorted({key for record in records for key in record.keys()})
+        n_keys = len(keys)
+    values = (rec.get(key, 0) for rec in records for key in keys)
+    matrix = np.fromiter(values, dtype=np.float32, count=len(records) * n_keys)
+    return matrix.reshape(len(records), n_keys)
+
+
+@functools.lru_cache(maxsize=1)
+def s3_client():
+    """Build the S3 client once; boto3 clients are thread-safe and costly to create."""
+    session = boto3.session.Session(
+        aws_access_key_id=os.getenv("S3_ACCESS_KEY"),
+        aws_secret_access_key=os.getenv("S3_SECRET_KEY"),
+        region_name=os.getenv("AWS_REGION", os.getenv("S3_REGION", "us-east-1")),
+    )
+    return session.client(
+        "s3",
+        endpoint_url=os.getenv("S3_ENDPOINT"),
     )
 
 
@@ -87,72 +149,173 @@ def download_model_if_needed(source: str) -> str:
     filename = Path(key).name or "model.onnx"
     local_path = target_dir / filename
 
-    LOGGER.info(
-        json.dumps(
-            {
-                "event": "MODEL_DOWNLOAD", 
-                "source": source,
-                "bucket": bucket,
-                "key": key,
-            }
-        )
-    )
-
-    session = boto3.session.Session(
-        aws_access_key_id=os.getenv("S3_ACCESS_KEY"),
-        aws_secret_access_key=os.getenv("S3_SECRET_KEY"),
-        region_name=os.getenv("AWS_REGION", os.getenv("S3_REGION", "us-east-1")),
-    )
-    s3 = session.client(
-        "s3",
-        endpoint_url=os.getenv("S3_ENDPOINT"),
-    )
+    log_event("MODEL_DOWNLOAD", source=source, bucket=bucket, key=key)
 
+    s3 = s3_client()
+    etag_path = local_path.with_name(local_path.name + ".etag")
     try:
-        s3.download_file(bucket, key, str(local_path))
+        etag = s3.head_object(Bucket=bucket, Key=key)["ETag"]
+        if local_path.exists() and etag_path.exists() and etag_path.read_text() == etag:
+            log_event("MODEL_DOWNLOAD_SKIPPED", path=str(local_path))
+            return str(local_path)
+        s3.download_file(bucket, key, str(local_path), Config=S3_TRANSFER_CONFIG)
     except (BotoCoreError, ClientError) as exc:
         raise RuntimeError(f"Failed to download model from {source}") from exc
+    etag_path.write_text(etag)
 
     return str(local_path)
 
 
+def quantize_model(path: str) -> str:
+    """Return the variant of ``path`` requested through ``MODEL_QUANT``.
+
+    ``int8`` applies dynamic weight quantisation and ``fp16`` halves the
+    weights while keeping float32 inputs/outputs, so callers are unaffected.
+    The converted graph is cached next to the original until the original
+    changes; any failure falls back to serving the FP32 model.
+    """
+
+    if MODEL_QUANT not in ("int8", "fp16"):
+        return path
+    base, ext = os.path.splitext(path)
+    target = f"{base}.{MODEL_QUANT}{ext}"
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+        return target
+
+    tmp_target = f"{base}.{MODEL_QUANT}.tmp{ext}"
+    try:
+        if MODEL_QUANT == "int8":
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(path, tmp_target, weight_type=QuantType.QInt8)
+        else:
+            import onnx
+            from onnxconverter_common import float16
+
+            model = float16.convert_float_to_float16(onnx.load(path), keep_io_types=True)
+            onnx.save(model, tmp_target)
+        os.replace(tmp_target, target)
+    except Exception as exc:
+        log_event(
+            "MODEL_QUANTIZE_FAILED",
+            modelPath=path,
+            quant=MODEL_QUANT,
+            error=str(exc),
+            level=logging.WARNING,
+        )
+        return path
+    return target
+
+
+def session_options() -> ort.SessionOptions:
+    """Graph optimisations on, and a small fixed thread budget per process.
+
+    ORT defaults to one intra-op thread per core, which oversubscribes the
+    CPU as soon as uvicorn runs more than one worker.
+    """
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = ORT_INTRA_OP_THREADS
+    options.inter_op_num_threads = 1
+    options.enable_mem_pattern = True
+    options.enable_cpu_mem_arena = True
+    return options
+
+
 def load_model() -> None:
-    global READY, ORT_SESSION, PKL_MODEL
+    global READY, ORT_SESSION, PKL_MODEL, INPUT_NAME, OUTPUT_NAME
     resolved_path = download_model_if_needed(MODEL_SOURCE_PATH)
     globals()["MODEL_PATH"] = resolved_path
-    if MODEL_FORMAT.lower() == "onnx":
+    if IS_ONNX:
+        resolved_path = quantize_model(resolved_path)
+        globals()["MODEL_PATH"] = resolved_path
         ORT_SESSION = ort.InferenceSession(
             resolved_path,
+            sess_options=session_options(),
             providers=["CPUExecutionProvider"],
         )
+        INPUT_NAME = ORT_SESSION.get_inputs()[0].name
+        OUTPUT_NAME = ORT_SESSION.get_outputs()[0].name
     else:
         PKL_MODEL = joblib.load(resolved_path)
     load_aux()
     READY = True
-    LOGGER.info(
-        json.dumps(
-            {
-                "event": "MODEL_LOADED",
-                "modelPath": resolved_path,
-                "modelFormat": MODEL_FORMAT,
-            }
-        )
-    )
+    log_event("MODEL_LOADED", modelPath=resolved_path, modelFormat=MODEL_FORMAT)
+
+
+def infer(X: np.ndarray) -> np.ndarray:
+    if IS_ONNX:
+        return run_onnx(X)
+    return PKL_MODEL.predict(X)
+
+
+def infer_batch(matrices: List[np.ndarray]) -> np.ndarray:
+    return infer(np.concatenate(matrices))
+
+
+def infer_records(records: List[Dict[str, Any]]) -> List[float]:
+    return infer(to_matrix(records)).tolist()
+
+
+async def batcher() -> None:
+    """Coalesce queued matrices into one model call per batching window.
+
+    The window opens with the first queued request and closes after
+    ``BATCH_WINDOW_MS`` or once ``BATCH_MAX_ROWS`` rows are waiting; each
+    caller then receives its own slice of the predictions.
+    """
+
+    loop = asyncio.get_running_loop()
+    window = BATCH_WINDOW_MS / 1000
+    while True:
+        batch = [await PENDING.get()]
+        rows = len(batch[0][0])
+        deadline = loop.time() + window
+        while rows < BATCH_MAX_ROWS:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(PENDING.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            rows += len(item[0])
+
+        # Model calls run in the threadpool (ORT releases the GIL) so the
+        # event loop keeps serving /healthz, /metrics and new requests.
+        try:
+            y = await run_in_threadpool(infer_batch, [X for X, _ in batch])
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            continue
+        offset = 0
+        for X, future in batch:
+            if not future.done():
+                future.set_result(y[offset : offset + len(X)])
+            offset += len(X)
 
 
 @app.on_event("startup")
 async def startup() -> None:
+    global PENDING, BATCHER
     Instrumentator().instrument(app).expose(app, endpoint="/metrics", include_in_schema=False)
     load_model()
-    LOGGER.info(
-        json.dumps(
-            {
-                "event": "INFERENCE_READY",
-                "modelPath": MODEL_PATH,
-                "modelFormat": MODEL_FORMAT,
-            }
-        )
-    )
+    # Batching needs a fixed feature width so requests can be stacked.
+    if BATCH_WINDOW_MS > 0 and N_FEATURES:
+        PENDING = asyncio.Queue()
+        BATCHER = asyncio.create_task(batcher())
+    log_event("INFERENCE_READY", modelPath=MODEL_PATH, modelFormat=MODEL_FORMAT)
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    if BATCHER is not None:
+        BATCHER.cancel()
 
 
 @app.get("/healthz", response_model=Health)
@@ -161,24 +324,44 @@ def health() -> Health:
     return Health(status=status, model_path=MODEL_PATH, model_format=MODEL_FORMAT)
 
 
+def run_onnx(X: np.ndarray) -> np.ndarray:
+    """Run the session reading ``X`` in place instead of copying it into ORT."""
+
+    session = ORT_SESSION
+    binding = session.io_binding()
+    binding.bind_cpu_input(INPUT_NAME, np.ascontiguousarray(X, dtype=np.float32))
+    binding.bind_output(OUTPUT_NAME)
+    session.run_with_iobinding(binding)
+    return binding.copy_outputs_to_cpu()[0]
+
+
+def parse_records(body: bytes) -> List[Dict[str, Any]]:
+    """Decode ``{"records": [{...}, ...]}`` without building Pydantic models."""
+
+    try:
+        records = orjson.loads(body)["records"]
+    except (orjson.JSONDecodeError, KeyError, TypeError) as exc:
+        raise HTTPException(
+            status_code=422, detail="Body must be a JSON object with a 'records' list"
+        ) from exc
+    if not isinstance(records, list) or not all(isinstance(rec, dict) for rec in records):
+        raise HTTPException(status_code=422, detail="'records' must be a list of objects")
+    return records
+
+
 @app.post("/predict")
-def predict(req: PredictRequest) -> Dict[str, Any]:
+async def predict(request: Request) -> Dict[str, Any]:
     if not READY:
         raise HTTPException(status_code=503, detail="Model not ready")
-    X = to_matrix(req.records)
-    if MODEL_FORMAT.lower() == "onnx":
-        input_name = ORT_SESSION.get_inputs()[0].name
-        y = ORT_SESSION.run(None, {input_name: X.astype(np.float32)})[0].tolist()
+    records = parse_records(await request.body())
+    # Encoding and inference are CPU-bound: keep them off the event loop.
+    if PENDING is not None:
+        X = await run_in_threadpool(to_matrix, records)
+        future = asyncio.get_running_loop().create_future()
+        await PENDING.put((X, future))
+        y = (await future).tolist()
     else:
-        y = PKL_MODEL.predict(X).tolist()
+        y = await run_in_threadpool(infer_records, records)
     result = {"predictions": y, "count": len(y)}
-    LOGGER.info(
-        json.dumps(
-            {
-                "event": "PREDICT_COMPLETED",
-                "records": len(req.records),
-                "modelPath": MODEL_PATH,
-            }
-        )
-    )
+    log_event("PREDICT_COMPLETED", records=len(records), modelPath=MODEL_PATH)
     return result
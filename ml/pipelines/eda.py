@@ -1,46 +1,168 @@
 import argparse
 import json
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-import matplotlib.pyplot as plt
-import pandas as pd
-import seaborn as sns
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import seaborn as sns  # noqa: E402
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = pacsv = None
+
+
+def available_cpus() -> int:
+    """CPUs this process may actually use (affinity mask and cgroup quota)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS/Windows
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as fh:
+            quota, period = fh.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+PLOT_WORKERS = int(os.getenv("EDA_PLOT_WORKERS") or available_cpus())
+# Each spawned worker re-imports pandas/matplotlib/seaborn (~1s); below this
+# many plots that start-up costs more than it saves.
+PLOT_PARALLEL_MIN_TASKS = int(os.getenv("EDA_PLOT_PARALLEL_MIN_TASKS", "16"))
 
 
 def load_data(path: str) -> pd.DataFrame:
-    """Load dataset from the provided path."""
-    return pd.read_csv(path)
+    """Load dataset from the provided path.
+
+    Uses pyarrow's multi-threaded CSV parser when available and keeps string
+    columns Arrow-backed instead of materialising Python objects.  Blank and
+    NA-like strings are read as missing, as ``pd.read_csv`` does.
+    """
+    if pacsv is None:
+        return pd.read_csv(path)
+    table = pacsv.read_csv(
+        path,
+        read_options=pacsv.ReadOptions(use_threads=True),
+        convert_options=pacsv.ConvertOptions(
+            strings_can_be_null=True, quoted_strings_can_be_null=True
+        ),
+    )
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+
+
+def describe(df: pd.DataFrame, num_cols: list, cat_cols: list) -> dict:
+    """Per-column statistics without the percentile sorts of ``describe()``."""
+    stats = {}
+    if num_cols:
+        stats = df[num_cols].agg(["count", "mean", "std", "min", "max"]).to_dict()
+    for col in cat_cols:
+        series = df[col]
+        mode = series.mode()
+        top = mode.iat[0] if len(mode) else None
+        if isinstance(top, np.generic):
+            top = top.item()
+        stats[col] = {
+            "count": int(series.count()),
+            "n_unique": int(series.nunique()),
+            "top": top,
+        }
+    return stats
+
+
+def _render_numeric(col: str, series: pd.Series, outdir: str) -> None:
+    plt.figure()
+    sns.histplot(series, kde=True)
+    plt.title(f"Histogram - {col}")
+    plt.savefig(f"{outdir}/hist_{col}.png")
+    plt.close()
+
+    plt.figure()
+    sns.boxplot(x=series)
+    plt.title(f"Boxplot - {col}")
+    plt.savefig(f"{outdir}/box_{col}.png")
+    plt.close()
+
+
+def _render_categorical(col: str, series: pd.Series, outdir: str) -> None:
+    plt.figure()
+    sns.countplot(x=series)
+    plt.title(f"Count - {col}")
+    plt.savefig(f"{outdir}/count_{col}.png")
+    plt.close()
+
+
+_PLOT_POOL: ProcessPoolExecutor | None = None
+
+
+def _plot_pool() -> ProcessPoolExecutor:
+    """Plot pool shared by every call in this process (workers start once).
+
+    Sized on ``PLOT_WORKERS`` alone; spawn-context pools only start workers as
+    tasks arrive, so small batches do not pay for idle processes.
+    """
+    global _PLOT_POOL
+    if _PLOT_POOL is None:
+        ctx = multiprocessing.get_context("spawn")
+        _PLOT_POOL = ProcessPoolExecutor(max_workers=PLOT_WORKERS, mp_context=ctx)
+    return _PLOT_POOL
+
+
+def _discard_plot_pool() -> None:
+    global _PLOT_POOL
+    if _PLOT_POOL is not None:
+        _PLOT_POOL.shutdown(wait=False, cancel_futures=True)
+        _PLOT_POOL = None
+
+
+def _render_plots(tasks: list, outdir: str) -> None:
+    """Render independent per-column plots, in parallel when it pays off.
+
+    Each task only ships its own column to the worker. ``spawn`` avoids
+    forking a copy of the caller's heap (the whole dataframe) per worker.
+    """
+    if PLOT_WORKERS > 1 and len(tasks) >= PLOT_PARALLEL_MIN_TASKS:
+        pool = _plot_pool()
+        try:
+            futures = [pool.submit(render, col, series, outdir) for render, col, series in tasks]
+            for future in futures:
+                future.result()
+            return
+        except BrokenProcessPool:
+            # A dead worker poisons the pool; shut it down and finish serially.
+            _discard_plot_pool()
+    for render, col, series in tasks:
+        render(col, series, outdir)
 
 
 def initial_exploration(df: pd.DataFrame, outdir: str):
     os.makedirs(outdir, exist_ok=True)
+    num_cols = df.select_dtypes(include="number").columns.tolist()
+    cat_cols = df.select_dtypes(exclude="number").columns.tolist()
     summary = {
-        "describe": df.describe(include="all").to_dict(),
+        "describe": describe(df, num_cols, cat_cols),
         "missing": df.isnull().sum().to_dict(),
     }
 
-    num_cols = df.select_dtypes(include="number").columns.tolist()
-    cat_cols = df.select_dtypes(exclude="number").columns.tolist()
-
-    for col in num_cols:
-        plt.figure()
-        sns.histplot(df[col], kde=True)
-        plt.title(f"Histogram - {col}")
-        plt.savefig(f"{outdir}/hist_{col}.png")
-        plt.close()
-
-        plt.figure()
-        sns.boxplot(x=df[col])
-        plt.title(f"Boxplot - {col}")
-        plt.savefig(f"{outdir}/box_{col}.png")
-        plt.close()
-
-    for col in cat_cols:
-        plt.figure()
-        sns.countplot(x=df[col])
-        plt.title(f"Count - {col}")
-        plt.savefig(f"{outdir}/count_{col}.png")
-        plt.close()
+    tasks = [(_render_numeric, col, df[col]) for col in num_cols]
+    tasks += [(_render_categorical, col, df[col]) for col in cat_cols]
+    _render_plots(tasks, outdir)
 
     return summary, num_cols, cat_cols
 
@@ -61,7 +183,14 @@ def relational_analysis(df: pd.DataFrame, outdir: str):
         plt.savefig(f"{outdir}/scatter_charges_bmi.png")
         plt.close()
 
-    corr = df.corr(numeric_only=True)
+    num_df = df.select_dtypes("number")
+    arr = np.ascontiguousarray(num_df.to_numpy(dtype=np.float32, na_value=np.nan))
+    # One corrcoef over complete rows instead of pandas' pairwise loop.
+    arr = arr[~np.isnan(arr).any(axis=1)]
+    corr_mat = np.atleast_2d(np.corrcoef(arr, rowvar=False)) if num_df.shape[1] else np.empty((0, 0))
+    corr = pd.DataFrame(corr_mat, index=num_df.columns, columns=num_df.columns)
+    if corr.empty:
+        return {}
     plt.figure()
     sns.heatmap(corr, annot=True, cmap="coolwarm")
     plt.title("Correlation Heatmap")
@@ -73,35 +202,51 @@ def relational_analysis(df: pd.DataFrame, outdir: str):
 
 def detect_outliers(df: pd.DataFrame, column: str, outdir: str):
     os.makedirs(outdir, exist_ok=True)
-    q1, q3 = df[column].quantile([0.25, 0.75])
+    # Work on the column's array and select rows by position, so only the
+    # outlier rows of the frame are ever copied.
+    values = df[column].to_numpy(dtype=float, na_value=np.nan)
+    q1, q3 = np.nanquantile(values, [0.25, 0.75])
     iqr = q3 - q1
     lo, hi = q1 - 1.5 * iqr, q3 + 1.5 * iqr
-    outliers = df[(df[column] < lo) | (df[column] > hi)]
-    outliers.to_csv(f"{outdir}/outliers.csv", index=False)
-    return {"count": int(len(outliers)), "lower": float(lo), "upper": float(hi)}
+    idx = np.flatnonzero((values < lo) | (values > hi))
+    df.iloc[idx].to_csv(f"{outdir}/outliers.csv", index=False)
+    return {"count": int(idx.size), "lower": float(lo), "upper": float(hi)}
 
 
 def save_summary(summary: dict, outpath: str) -> None:
-    with open(outpath, "w", encoding="utf-8") as f:
-        json.dump(summary, f, indent=2)
+    if orjson is None:
+        with open(outpath, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return
+    options = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    with open(outpath, "wb") as f:
+        f.write(orjson.dumps(summary, option=options))
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--input", required=True)
-    parser.add_argument("--output", required=True)
-    parser.add_argument("--outliers-col", default="charges")
-    args = parser.parse_args()
+def write_report(output_dir: str) -> str:
+    report_path = os.path.join(output_dir, "eda-report.html")
+    plots_dir = os.path.join(output_dir, "plots")
+    with os.scandir(plots_dir) as entries:
+        plots = sorted(e.name for e in entries if e.is_file())
+    body = "".join(
+        f'<li><img src="plots/{plot}" alt="{plot}" style="max-width: 800px"/></li>' for plot in plots
+    )
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(f"<html><body><h1>EDA Report</h1><ul>{body}</ul></body></html>")
+    return report_path
 
-    os.makedirs(args.output, exist_ok=True)
-    df = load_data(args.input)
 
-    exploration_summary, num_cols, cat_cols = initial_exploration(df, f"{args.output}/plots")
-    corr_summary = relational_analysis(df, f"{args.output}/plots")
+def run(input_path: str, output_dir: str, outliers_col: str = "charges") -> dict:
+    """Run the full EDA and return the summary also stored in ``eda-summary.json``."""
+    os.makedirs(output_dir, exist_ok=True)
+    df = load_data(input_path)
+
+    exploration_summary, num_cols, cat_cols = initial_exploration(df, f"{output_dir}/plots")
+    corr_summary = relational_analysis(df, f"{output_dir}/plots")
 
     outliers_summary = {}
-    if args.outliers_col in df.columns:
-        outliers_summary = detect_outliers(df, args.outliers_col, args.output)
+    if outliers_col in df.columns:
+        outliers_summary = detect_outliers(df, outliers_col, output_dir)
 
     summary = {
         "describe": exploration_summary["describe"],
@@ -110,17 +255,19 @@ def main():
         "outliers": outliers_summary,
         "columns": {"numeric": num_cols, "categorical": cat_cols},
     }
-    save_summary(summary, f"{args.output}/eda-summary.json")
+    save_summary(summary, f"{output_dir}/eda-summary.json")
+    write_report(output_dir)
+    return summary
 
-    report_path = os.path.join(args.output, "eda-report.html")
-    plots_dir = os.path.join(args.output, "plots")
-    with open(report_path, "w", encoding="utf-8") as f:
-        f.write("<html><body><h1>EDA Report</h1><ul>")
-        for plot in sorted(os.listdir(plots_dir)):
-            f.write(
-                f'<li><img src="plots/{plot}" alt="{plot}" style="max-width: 800px"/></li>'
-            )
-        f.write("</ul></body></html>")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--outliers-col", default="charges")
+    args = parser.parse_args()
+
+    run(args.input, args.output, args.outliers_col)
 
 
 if __name__ == "__main__":
@@ -9,14 +9,22 @@ instructions for this iteration.
 from __future__ import annotations
 
 import argparse
+import functools
 import json
 from pathlib import Path
 from typing import Dict, Tuple
 
 import yaml
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
 
+
+POLICY_PATH = Path("ml/policies/promotion.yaml")
 DEFAULT_THRESHOLDS = {"r2_min_gain": 0.01, "rmse_min_drop": 100}
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 
 def parse_args() -> argparse.Namespace:
@@ -27,24 +35,41 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+@functools.lru_cache(maxsize=64)
+def _load_json(path: str, mtime_ns: int, size: int) -> Dict[str, float]:
+    data = Path(path).read_bytes()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
 def load_json(path: str) -> Dict[str, float]:
-    file_path = Path(path)
-    if not file_path.exists():
+    try:
+        st = Path(path).stat()
+    except FileNotFoundError:
+        return {}
+    # An empty metrics file (e.g. a truncated write) means "no metrics yet".
+    if st.st_size == 0:
         return {}
-    with open(file_path, encoding="utf-8") as f:
-        return json.load(f)
+    return dict(_load_json(str(path), st.st_mtime_ns, st.st_size))
+
+
+@functools.lru_cache(maxsize=8)
+def _load_thresholds(path: str, mtime: float) -> Dict[str, float]:
+    """Parse the policy once per ``(path, mtime)``; editing the file invalidates it."""
+
+    with open(path, encoding="utf-8") as f:
+        policy = yaml.load(f, Loader=YAML_LOADER) or {}
+    thresholds = policy.get("thresholds", {})
+    merged = DEFAULT_THRESHOLDS.copy()
+    merged.update({k: float(v) for k, v in thresholds.items() if isinstance(v, (int, float))})
+    return merged
 
 
 def load_thresholds() -> Dict[str, float]:
-    policy_path = Path("ml/policies/promotion.yaml")
-    if policy_path.exists():
-        with open(policy_path, encoding="utf-8") as f:
-            policy = yaml.safe_load(f) or {}
-        thresholds = policy.get("thresholds", {})
-        merged = DEFAULT_THRESHOLDS.copy()
-        merged.update({k: float(v) for k, v in thresholds.items() if isinstance(v, (int, float))})
-        return merged
-    return DEFAULT_THRESHOLDS
+    try:
+        mtime = POLICY_PATH.stat().st_mtime
+    except FileNotFoundError:
+        return DEFAULT_THRESHOLDS.copy()
+    return _load_thresholds(str(POLICY_PATH), mtime).copy()
 
 
 def compute_deltas(
@@ -101,15 +126,30 @@ def evaluate(current: Dict[str, float], candidate: Dict[str, float]) -> Dict[str
     }
 
 
-def main() -> None:
-    args = parse_args()
-    current = load_json(args.current)
-    candidate = load_json(args.candidate)
+def run(candidate_path: str, current_path: str, out_path: str) -> Dict[str, object]:
+    """Compare both metrics files and store the result in ``out_path``."""
+
+    current = load_json(current_path)
+    candidate = load_json(candidate_path)
     result = evaluate(current, candidate)
-    with open(args.out, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2)
+    write_json(out_path, result)
     status = "IMPROVED" if result["improved"] else "NOT IMPROVED"
-    print(f"[evaluate] Comparison stored in {args.out} — {status}")
+    print(f"[evaluate] Comparison stored in {out_path} — {status}")
+    return result
+
+
+def write_json(path: str, data: Dict[str, object]) -> None:
+    if orjson is None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        return
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+
+
+def main() -> None:
+    args = parse_args()
+    run(args.candidate, args.current, args.out)
 
 
 if __name__ == "__main__":
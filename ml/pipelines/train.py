@@ -7,8 +7,8 @@ main responsibilities are:
 * Load a tabular dataset (CSV expected) identified by ``--dataset``.
 * Train a simple regression model (default: ``LinearRegression``) using a
   one-hot encoded representation for categorical variables.
-* Persist the trained model in ONNX format when the conversion succeeds (falls
-  back to a ``.pkl`` artefact otherwise).
+* Persist the trained model in ONNX format (falls back to a ``.pkl`` artefact
+  when the conversion fails); ``--export-format pkl`` skips the conversion.
 * Emit accompanying artefacts: ``metrics.json``, ``model-card.yaml`` and a
   compact metadata JSON with the feature order so that the inference service
   can reproduce the same input contract.
@@ -26,7 +26,7 @@ import argparse
 import json
 import math
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, Tuple
 
@@ -34,12 +34,23 @@ import joblib
 import numpy as np
 import pandas as pd
 import yaml
+from scipy import linalg
 from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.model_selection import train_test_split
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+try:
+    from pyarrow import csv as pacsv
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pacsv = None
+
 
 DEFAULT_TARGET = "charges"
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
 
 
 @dataclass
@@ -50,6 +61,7 @@ class TrainConfig:
     params: Dict[str, Any] | None = None
     test_size: float = 0.2
     random_state: int = 42
+    export_format: str = "onnx"
 
 
 def parse_args() -> TrainConfig:
@@ -70,6 +82,12 @@ def parse_args() -> TrainConfig:
         default=42,
         help="Random seed used for data splitting",
     )
+    parser.add_argument(
+        "--export-format",
+        choices=("onnx", "pkl", "both"),
+        default="onnx",
+        help="Model artefact to produce; 'both' also keeps the pickle next to the ONNX file",
+    )
 
     args = parser.parse_args()
     params: Dict[str, Any] | None = None
@@ -86,11 +104,33 @@ def parse_args() -> TrainConfig:
         params=params,
         test_size=args.test_size,
         random_state=args.random_state,
+        export_format=args.export_format,
     )
 
 
+def utc_timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
 def load_dataset(config: TrainConfig) -> Tuple[pd.DataFrame, pd.Series]:
-    df = pd.read_csv(config.dataset)
+    if pacsv is None:
+        df = pd.read_csv(config.dataset)
+    else:
+        # Multi-threaded parse; low-cardinality strings arrive dictionary
+        # encoded and become pandas Categoricals, ready for one-hot encoding.
+        # strings_can_be_null keeps pandas' semantics: blanks and NA/N/A in
+        # string columns are missing values, not categories.
+        table = pacsv.read_csv(
+            config.dataset,
+            read_options=pacsv.ReadOptions(use_threads=True),
+            convert_options=pacsv.ConvertOptions(
+                auto_dict_encode=True,
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=True,
+            ),
+        )
+        df = table.to_pandas(self_destruct=True)
+        del table
     if config.target not in df.columns:
         raise SystemExit(f"Target column '{config.target}' not present in dataset")
     y = df[config.target]
@@ -98,24 +138,56 @@ def load_dataset(config: TrainConfig) -> Tuple[pd.DataFrame, pd.Series]:
     return X, y
 
 
-def prepare_features(X: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+def prepare_features(X: pd.DataFrame) -> Tuple[np.ndarray, Dict[str, Any]]:
     """Encode categorical columns using one-hot encoding.
 
-    Returns the transformed dataframe and metadata describing the
-    transformation.  The inference service relies on ``feature_order`` when it
-    converts incoming payloads to matrices, therefore we persist that in a
-    machine readable companion file.
+    Returns the design matrix as an ndarray (columns in ``feature_order``) and
+    metadata describing the transformation.  The inference service relies on
+    ``feature_order`` when it converts incoming payloads to matrices,
+    therefore we persist that in a machine readable companion file.
     """
 
     categorical = X.select_dtypes(exclude=[np.number]).columns.tolist()
-    transformed = pd.get_dummies(X, columns=categorical, drop_first=False)
-    transformed = transformed.astype(float)
+    numeric = [col for col in X.columns if col not in set(categorical)]
+
+    # Same layout as ``pd.get_dummies``: numeric columns first, then one
+    # ``<column>_<category>`` block per categorical column.  Each column is
+    # converted to ``category`` once; its (int8/int16) codes drive the scatter
+    # below and its categories name the block.
+    feature_order = list(numeric)
+    codes_per_column = []
+    for col in categorical:
+        values = X[col].astype("category")
+        categories = values.cat.categories
+        # Dictionary-encoded input keeps categories in order of appearance;
+        # sort them so ``feature_order`` does not depend on row order or on
+        # the CSV reader.
+        if not values.cat.ordered and not categories.is_monotonic_increasing:
+            values = values.cat.reorder_categories(categories.sort_values())
+            categories = values.cat.categories
+        codes_per_column.append((values.cat.codes.to_numpy(), len(categories)))
+        feature_order.extend(f"{col}_{category}" for category in categories)
+
+    # float32 throughout: the ONNX export declares a FloatTensorType input and
+    # the solver streams half the bytes of a float64 matrix.
+    out = np.zeros((len(X), len(feature_order)), dtype=np.float32)
+    if numeric:
+        out[:, : len(numeric)] = X[numeric].to_numpy(dtype=np.float32, na_value=np.nan)
+    rows = np.arange(len(X))
+    offset = len(numeric)
+    for codes, width in codes_per_column:
+        # Missing values have code -1 and leave their row all-zero, as with
+        # ``get_dummies(drop_first=False)``.
+        present = codes >= 0
+        out[rows[present], offset + codes[present]] = 1.0
+        offset += width
+
     metadata = {
-        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "generated_at": utc_timestamp(),
         "categorical_columns": categorical,
-        "feature_order": transformed.columns.tolist(),
+        "feature_order": feature_order,
     }
-    return transformed, metadata
+    return out, metadata
 
 
 def build_model(params: Dict[str, Any] | None) -> LinearRegression:
@@ -125,45 +197,94 @@ def build_model(params: Dict[str, Any] | None) -> LinearRegression:
     return model
 
 
+def fit_normal_equations(model: LinearRegression, X: np.ndarray, y: np.ndarray) -> None:
+    """Fit ``model`` by solving ``X'X b = X'y`` instead of an SVD least squares.
+
+    The Gram matrix is a single float32 GEMM and the solve is a Cholesky
+    factorisation, both far cheaper than ``lstsq`` when rows vastly outnumber
+    features.  A tiny ridge keeps the system positive definite despite the
+    collinear one-hot blocks; if the factorisation still fails we fall back to
+    ``lstsq``.  The fitted attributes are set on the ``LinearRegression`` so
+    prediction and ONNX export work unchanged.
+    """
+
+    if model.fit_intercept:
+        x_mean = X.mean(axis=0, dtype=np.float64)
+        y_mean = float(y.mean(dtype=np.float64))
+        X = X - x_mean.astype(X.dtype)
+        y = y - np.asarray(y_mean, dtype=y.dtype)
+    xtx = (X.T @ X).astype(np.float64)
+    xty = (X.T @ y).astype(np.float64)
+    ridge = 1e-8 * max(float(np.trace(xtx)) / max(len(xtx), 1), 1.0)
+    try:
+        coef = linalg.solve(
+            xtx + ridge * np.eye(len(xtx)), xty, assume_a="pos", overwrite_a=True
+        )
+    except linalg.LinAlgError:
+        coef = linalg.lstsq(X, y)[0].astype(np.float64)
+
+    model.coef_ = coef
+    model.intercept_ = y_mean - float(x_mean @ coef) if model.fit_intercept else 0.0
+    model.n_features_in_ = X.shape[1]
+
+
 def export_model(
     model: LinearRegression,
     feature_order: list[str],
     outdir: Path,
+    export_format: str = "onnx",
 ) -> Tuple[Path, str]:
-    """Persist the model and return the artefact path plus its format."""
+    """Persist the model and return the artefact path plus its format.
 
-    onnx_path = outdir / "model.onnx"
-    try:
-        from skl2onnx import convert_sklearn
-        from skl2onnx.common.data_types import FloatTensorType
+    skl2onnx (and the onnx/protobuf stack behind it) is only imported when an
+    ONNX artefact was requested.
+    """
 
-        initial_type = [("input", FloatTensorType([None, len(feature_order)]))]
-        onnx_model = convert_sklearn(model, initial_types=initial_type)
-        with open(onnx_path, "wb") as f:
-            f.write(onnx_model.SerializeToString())
-        return onnx_path, "onnx"
-    except Exception as exc:  # pragma: no cover - depends on optional deps
-        fallback_path = outdir / "model.pkl"
-        print(f"[train] Failed to export ONNX ({exc}); storing pickle at {fallback_path}")
-        joblib.dump(model, fallback_path)
-        return fallback_path, "pkl"
+    pkl_path = outdir / "model.pkl"
+    if export_format in ("onnx", "both"):
+        onnx_path = outdir / "model.onnx"
+        try:
+            from skl2onnx import convert_sklearn
+            from skl2onnx.common.data_types import FloatTensorType
+
+            initial_type = [("input", FloatTensorType([None, len(feature_order)]))]
+            onnx_model = convert_sklearn(model, initial_types=initial_type)
+            with open(onnx_path, "wb") as f:
+                f.write(onnx_model.SerializeToString())
+            if export_format == "both":
+                joblib.dump(model, pkl_path)
+            return onnx_path, "onnx"
+        except Exception as exc:  # pragma: no cover - depends on optional deps
+            print(f"[train] Failed to export ONNX ({exc}); storing pickle at {pkl_path}")
+    joblib.dump(model, pkl_path)
+    return pkl_path, "pkl"
 
 
 def compute_metrics(
     model: LinearRegression,
     X_test: np.ndarray,
-    y_test: pd.Series,
+    y_test: np.ndarray,
 ) -> Dict[str, float]:
-    preds = model.predict(X_test)
-    rmse = math.sqrt(mean_squared_error(y_test, preds))
-    mae = mean_absolute_error(y_test, preds)
-    r2 = r2_score(y_test, preds)
+    preds = np.asarray(model.predict(X_test), dtype=np.float32)
+    errors = preds - y_test
+    rmse = math.sqrt(np.mean(errors * errors))
+    mae = np.mean(np.abs(errors))
+    # Accumulate the sums of squares in float64 even though the inputs are float32.
+    ss_res = np.sum(errors * errors, dtype=np.float64)
+    ss_tot = np.sum((y_test - y_test.mean(dtype=np.float64)) ** 2, dtype=np.float64)
+    if ss_tot:
+        r2 = 1.0 - ss_res / ss_tot
+    else:  # constant target: same convention as sklearn's r2_score
+        r2 = 1.0 if ss_res == 0 else 0.0
     return {"rmse": float(rmse), "mae": float(mae), "r2": float(r2)}
 
 
 def write_json(path: Path, data: Dict[str, Any]) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    if orjson is None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        return
+    path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
 
 
 def write_model_card(
@@ -181,7 +302,7 @@ def write_model_card(
         "model": {
             "type": "linear_regression",
             "format": model_format,
-            "created_at": datetime.utcnow().isoformat() + "Z",
+            "created_at": metadata["generated_at"],
         },
         "dataset": {
             "path": str(dataset),
@@ -200,29 +321,35 @@ def write_model_card(
         "metrics": metrics,
     }
     with open(path, "w", encoding="utf-8") as f:
-        yaml.safe_dump(card, f, sort_keys=False)
+        yaml.dump(card, f, Dumper=YAML_DUMPER, sort_keys=False, default_flow_style=False)
 
 
-def main() -> None:
-    config = parse_args()
+def run(config: TrainConfig) -> Dict[str, Any]:
+    """Train, export and document a model; return the produced artefacts."""
+
     config.outdir.mkdir(parents=True, exist_ok=True)
 
     X_raw, y = load_dataset(config)
     X, metadata = prepare_features(X_raw)
 
     X_train, X_test, y_train, y_test = train_test_split(
-        X.values,
-        y.values,
+        X,
+        y.to_numpy(dtype=np.float32),
         test_size=config.test_size,
         random_state=config.random_state,
     )
 
     model = build_model(config.params)
-    model.fit(X_train, y_train)
+    if (config.params or {}).get("solver") == "normal" and not model.positive:
+        fit_normal_equations(model, X_train, y_train)
+    else:
+        model.fit(X_train, y_train)
 
     metrics = compute_metrics(model, X_test, y_test)
 
-    model_path, model_format = export_model(model, metadata["feature_order"], config.outdir)
+    model_path, model_format = export_model(
+        model, metadata["feature_order"], config.outdir, config.export_format
+    )
 
     metrics_path = config.outdir / "metrics.json"
     write_json(metrics_path, metrics)
@@ -253,6 +380,16 @@ def main() -> None:
     print(f"[train] Model card: {model_card_path}")
     print(f"[train] Metadata: {metadata_path}")
 
+    return {
+        "model_path": str(model_path),
+        "model_format": model_format,
+        "metrics": metrics,
+    }
+
+
+def main() -> None:
+    run(parse_args())
+
 
 if __name__ == "__main__":
     main()
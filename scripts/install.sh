@@ -9,9 +9,8 @@ scripts/check-prereqs.sh
 
 echo "▶ Bootstrap $OVERLAY"
 python3 tools/soectl/soectl.py init --overlay "$OVERLAY"
-python3 tools/soectl/soectl.py bootstrap --overlay "$OVERLAY"
 
-echo "▶ Sync (apply + prune)"
-python3 tools/soectl/soectl.py sync --overlay "$OVERLAY" --prune
+echo "▶ Bootstrap + sync (apply + prune)"
+python3 tools/soectl/soectl.py up --overlay "$OVERLAY" --prune
 
 echo "✅ Instalación básica completada en overlay '$OVERLAY'"
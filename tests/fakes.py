@@ -0,0 +1,15 @@
+"""Dobles de prueba compartidos por los tests."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class FakeProc:
+    """Sustituto liviano de ``subprocess.CompletedProcess``."""
+
+    returncode: int
+    stdout: str = ""
+    stderr: str = ""
+    args: list[str] = field(default_factory=list)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+from fakes import FakeProc
+
+ROOT = Path(__file__).resolve().parents[1]
+_spec = importlib.util.spec_from_file_location(
+    "gitops_lite", ROOT / "tools" / "gitops-lite" / "gitops-lite.py"
+)
+gitops_lite = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(gitops_lite)  # type: ignore[union-attr]
+
+
+class _FakeKubectl:
+    """Responde con salidas enlatadas según el verbo y recuerda cada llamada."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls: list[list[str]] = []
+
+    def run(self, args, *, input_data=None, check=True):
+        args = list(args)
+        self.calls.append(args)
+        return self.responses(args)
+
+
+DIFF_OUTPUT = """\
+diff -u -N /tmp/LIVE-1/apps.v1.Deployment.soe-eda-dev.inference /tmp/MERGED-1/apps.v1.Deployment.soe-eda-dev.inference
+--- /tmp/LIVE-1/apps.v1.Deployment.soe-eda-dev.inference\t2026-10-15 10:00:00
++++ /tmp/MERGED-1/apps.v1.Deployment.soe-eda-dev.inference\t2026-10-15 10:00:01
+@@ -1 +1 @@
+-  replicas: 1
++  replicas: 2
+--- /tmp/LIVE-1/v1.Namespace..soe-eda-dev
++++ /tmp/MERGED-1/v1.Namespace..soe-eda-dev
+--- /tmp/LIVE-1/v1.ConfigMap.default.app.config
++++ /tmp/MERGED-1/v1.ConfigMap.default.app.config
+"""
+
+
+def test_changed_resources_parses_diff_filenames():
+    """Grupo core, recursos de clúster (``..``) y nombres con puntos."""
+
+    kubectl = _FakeKubectl(lambda args: FakeProc(1, DIFF_OUTPUT))
+
+    changed = gitops_lite.changed_resources(kubectl, "manifest")
+
+    assert changed == {
+        ("Deployment", "soe-eda-dev", "inference"),
+        ("Namespace", "", "soe-eda-dev"),
+        ("ConfigMap", "default", "app.config"),
+    }
+    assert kubectl.calls == [["diff", "-f", "-"]]
+
+
+def test_changed_resources_fails_on_kubectl_error():
+    kubectl = _FakeKubectl(lambda args: FakeProc(2, "", "boom\n"))
+
+    with pytest.raises(SystemExit) as exc:
+        gitops_lite.changed_resources(kubectl, "manifest")
+
+    assert exc.value.code == 2
+
+
+def test_existing_resources_falls_back_per_kind():
+    """Si el get combinado falla (CRD ausente), se consulta cada kind por separado."""
+
+    def responses(args):
+        kinds = args[1]
+        if kinds == "ConfigMap":
+            return FakeProc(0, "ConfigMap/app\n")
+        if kinds == "Deployment":
+            return FakeProc(0, "Deployment/inference\n")
+        return FakeProc(1, "", "the server doesn't have a resource type\n")
+
+    kubectl = _FakeKubectl(responses)
+
+    existing = gitops_lite.existing_resources(
+        kubectl, "soe-eda-dev", ["Route", "Deployment", "ConfigMap"]
+    )
+
+    assert existing == {("ConfigMap", "app"), ("Deployment", "inference")}
+    assert [call[1] for call in kubectl.calls] == [
+        "ConfigMap,Deployment,Route",
+        "ConfigMap",
+        "Deployment",
+        "Route",
+    ]
+    assert all(call[-2:] == ["-n", "soe-eda-dev"] for call in kubectl.calls)
+
+
+def test_summarize_status_matches_namespaceless_resources(capsys: pytest.CaptureFixture[str]):
+    """Sin metadata.namespace el diff se compara solo por kind y nombre."""
+
+    docs = [
+        {"kind": "Namespace", "metadata": {"name": "soe-eda-dev"}},
+        {"kind": "ConfigMap", "metadata": {"name": "app.config"}},
+        {"kind": "Deployment", "metadata": {"name": "inference", "namespace": "soe-eda-dev"}},
+        {"kind": "Service", "metadata": {"name": "inference", "namespace": "soe-eda-dev"}},
+        {"kind": "Secret", "metadata": {"name": "s3", "namespace": "soe-eda-dev"}},
+    ]
+
+    def responses(args):
+        if args[0] == "diff":
+            return FakeProc(1, DIFF_OUTPUT)
+        if "-n" in args:
+            return FakeProc(0, "Deployment/inference\nService/inference\n")
+        return FakeProc(0, "Namespace/soe-eda-dev\nConfigMap/app.config\n")
+
+    kubectl = _FakeKubectl(responses)
+
+    gitops_lite.summarize_status(kubectl, docs)
+
+    assert capsys.readouterr().out.splitlines() == [
+        "Namespace/soe-eda-dev: Changed",
+        "ConfigMap/app.config: Changed",
+        "Deployment/soe-eda-dev/inference: Changed",
+        "Service/soe-eda-dev/inference: Same",
+        "Secret/soe-eda-dev/s3: Added",
+        "Summary: Added=1, Changed=3, Same=1",
+    ]
+    assert len(kubectl.calls) == 3
+
+
+def test_pipeline_applies_even_when_plan_fails(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    """El plan es solo informativo: un ``kubectl diff`` fallido no impide el apply."""
+
+    streamed: list[list[str]] = []
+
+    def fake_stream(self, args, *, input_data=None):
+        args = list(args)
+        streamed.append(args)
+        return 2 if args[0] == "diff" else 0
+
+    monkeypatch.setattr(gitops_lite, "render_once", lambda path, use_kustomize: "kind: Foo\n")
+    monkeypatch.setattr(gitops_lite.KubectlRunner, "stream", fake_stream)
+
+    returncode = gitops_lite.main(["pipeline", "--path", "overlay", "--plan", "--apply"])
+
+    assert returncode == 0
+    assert streamed == [["diff", "-f", "-"], ["apply", "-f", "-"]]
+    assert "plan failed (kubectl diff exit 2)" in capsys.readouterr().err
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+for _dependency in ("fastapi", "onnxruntime", "boto3", "prometheus_fastapi_instrumentator"):
+    pytest.importorskip(_dependency)
+
+from fastapi import HTTPException  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+_spec = importlib.util.spec_from_file_location(
+    "inference_service", ROOT / "app" / "inference-service" / "main.py"
+)
+inference = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(inference)  # type: ignore[union-attr]
+
+
+def test_parse_records_accepts_records_list():
+    assert inference.parse_records(b'{"records": [{"age": 30}]}') == [{"age": 30}]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [b"not json", b"[]", b'{"rows": []}', b'{"records": {"age": 1}}', b'{"records": [1]}'],
+)
+def test_parse_records_rejects_malformed_bodies(body: bytes):
+    with pytest.raises(HTTPException) as exc:
+        inference.parse_records(body)
+
+    assert exc.value.status_code == 422
+
+
+def test_to_matrix_follows_feature_order(monkeypatch: pytest.MonkeyPatch):
+    """Columnas en el orden del modelo; las ausentes valen 0 y las extra se ignoran."""
+
+    monkeypatch.setattr(inference, "FEATURE_ORDER", ("age", "bmi", "sex_male"))
+    monkeypatch.setattr(inference, "N_FEATURES", 3)
+
+    matrix = inference.to_matrix([{"bmi": 22.5, "age": 30, "extra": 9}, {"sex_male": 1}])
+
+    assert matrix.dtype == np.float32
+    np.testing.assert_array_equal(matrix, [[30, 22.5, 0], [0, 0, 1]])
+
+
+def test_to_matrix_without_metadata_sorts_keys(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(inference, "FEATURE_ORDER", ())
+    monkeypatch.setattr(inference, "N_FEATURES", 0)
+
+    matrix = inference.to_matrix([{"b": 2, "a": 1}, {"a": 3}])
+
+    np.testing.assert_array_equal(matrix, [[1, 2], [3, 0]])
+
+
+def _run_batches(monkeypatch: pytest.MonkeyPatch, matrices, infer, *, max_rows=1024):
+    """Encola ``matrices`` a la vez y devuelve lo que recibe cada llamador."""
+
+    monkeypatch.setattr(inference, "infer", infer)
+    monkeypatch.setattr(inference, "BATCH_WINDOW_MS", 50.0)
+    monkeypatch.setattr(inference, "BATCH_MAX_ROWS", max_rows)
+
+    async def scenario():
+        monkeypatch.setattr(inference, "PENDING", asyncio.Queue())
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in matrices]
+        for X, future in zip(matrices, futures):
+            inference.PENDING.put_nowait((X, future))
+        task = asyncio.create_task(inference.batcher())
+        try:
+            return await asyncio.gather(*futures, return_exceptions=True)
+        finally:
+            task.cancel()
+
+    return asyncio.run(scenario())
+
+
+def _rows(*values):
+    return np.array([[value] for value in values], dtype=np.float32)
+
+
+def test_batcher_slices_predictions_per_caller(monkeypatch: pytest.MonkeyPatch):
+    calls = []
+
+    def fake_infer(X):
+        calls.append(len(X))
+        return X[:, 0] * 10
+
+    results = _run_batches(monkeypatch, [_rows(1), _rows(2, 3), _rows(4, 5, 6)], fake_infer)
+
+    assert calls == [6]
+    assert [result.tolist() for result in results] == [[10], [20, 30], [40, 50, 60]]
+
+
+def test_batcher_closes_window_at_max_rows(monkeypatch: pytest.MonkeyPatch):
+    calls = []
+
+    def fake_infer(X):
+        calls.append(len(X))
+        return X[:, 0]
+
+    results = _run_batches(
+        monkeypatch, [_rows(1, 2), _rows(3, 4), _rows(5)], fake_infer, max_rows=3
+    )
+
+    assert calls == [4, 1]
+    assert [result.tolist() for result in results] == [[1, 2], [3, 4], [5]]
+
+
+def test_batcher_failure_fails_every_caller_in_batch(monkeypatch: pytest.MonkeyPatch):
+    def fake_infer(X):
+        raise ValueError("bad input")
+
+    results = _run_batches(monkeypatch, [_rows(1), _rows(2, 3)], fake_infer)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(results) == 2
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+PIPELINES = ROOT / "ml" / "pipelines"
+if str(PIPELINES) not in sys.path:
+    sys.path.insert(0, str(PIPELINES))
+
+import eda  # noqa: E402
+import train  # noqa: E402
+
+CSV_WITH_MISSING = """age,sex,region,charges
+19,female,north,100.5
+30,,south,200
+40,male,NA,300
+50,N/A,,400
+"""
+
+
+@pytest.fixture
+def dataset(tmp_path: Path) -> Path:
+    path = tmp_path / "insurance.csv"
+    path.write_text(CSV_WITH_MISSING)
+    return path
+
+
+@pytest.mark.parametrize("use_pyarrow", [True, False])
+def test_feature_order_matches_get_dummies_with_missing_categories(
+    monkeypatch: pytest.MonkeyPatch, dataset: Path, tmp_path: Path, use_pyarrow: bool
+):
+    """Celdas vacías o NA en columnas categóricas no deben convertirse en categorías."""
+
+    if not use_pyarrow:
+        monkeypatch.setattr(train, "pacsv", None)
+    elif train.pacsv is None:  # pragma: no cover - depends on optional deps
+        pytest.skip("pyarrow no instalado")
+
+    X, _ = train.load_dataset(train.TrainConfig(dataset=dataset, outdir=tmp_path))
+    _, metadata = train.prepare_features(X)
+
+    expected = pd.get_dummies(pd.read_csv(dataset).drop(columns=["charges"]))
+    assert metadata["feature_order"] == list(expected.columns)
+
+
+def test_eda_counts_missing_strings(dataset: Path):
+    """El resumen de EDA reporta los faltantes de columnas de texto."""
+
+    df = eda.load_data(str(dataset))
+
+    assert df.isnull().sum().to_dict() == {"age": 0, "sex": 2, "region": 2, "charges": 0}
@@ -1,13 +1,14 @@
 from __future__ import annotations
 
+import os
 import sys
 from pathlib import Path
 from typing import Dict
 
-import subprocess
-
 import pytest
 
+from fakes import FakeProc
+
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
@@ -45,7 +46,7 @@ metadata:
   name: demo
   namespace: ns-demo
 """
-        return subprocess.CompletedProcess(cmd, 0, manifest, "")
+        return FakeProc(0, manifest, args=cmd)
 
     monkeypatch.setattr(soectl.subprocess, "run", fake_run)
 
@@ -67,3 +68,124 @@ def test_summarize_returns_empty_without_render(monkeypatch: pytest.MonkeyPatch)
     summary = soectl._summarize_rendered_resources(Path("/fake/overlay"))
 
     assert summary == {}
+
+
+def test_secrets_env_file_escapes_godotenv_syntax(monkeypatch: pytest.MonkeyPatch):
+    """Los valores llegan a gh sin expansión de ``$VAR`` ni saltos de línea crudos."""
+
+    calls: list[tuple[list[str], str | None]] = []
+
+    def fake_run(cmd, check=True, env=None, input=None, capture=False):
+        calls.append((cmd, input))
+        return soectl.Result(0, None, None)
+
+    monkeypatch.setattr(soectl, "_repo_slug", lambda: "org/repo")
+    monkeypatch.setattr(soectl, "_which", _fake_which_factory({"gh": "/usr/bin/gh"}))
+    monkeypatch.setattr(soectl, "run", fake_run)
+    monkeypatch.setenv("K8S_SERVER_DEV", "https://api:6443")
+    monkeypatch.setenv("K8S_TOKEN_DEV", 'a$HOME${USER}"b\\c\r\nd')
+
+    soectl.secrets(env="dev", from_env=True)
+
+    assert calls == [
+        (
+            ["/usr/bin/gh", "secret", "set", "--repo", "org/repo", "--env-file", "-"],
+            'K8S_SERVER_DEV="https://api:6443"\n'
+            'K8S_TOKEN_DEV="a\\$HOME\\${USER}\\"b\\\\c\\r\\nd"\n',
+        )
+    ]
+
+
+@pytest.fixture
+def doctor_env(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    """doctor con caché y kubeconfig temporales; cuenta las consultas de versión."""
+
+    kubeconfig = tmp_path / "kubeconfig"
+    kubeconfig.write_text("apiVersion: v1\n")
+    cache_dir = tmp_path / "cache"
+    version_calls: list[list[str]] = []
+
+    def fake_run(cmd, check=True, env=None, input=None, capture=False):
+        version_calls.append(cmd)
+        return soectl.Result(0, "Server Version: v1.30.0\n", "")
+
+    monkeypatch.setenv("KUBECONFIG", str(kubeconfig))
+    monkeypatch.setattr(soectl, "CACHE_DIR", cache_dir)
+    monkeypatch.setattr(soectl, "CLUSTER_VERSION_CACHE", cache_dir / "cluster_version.json")
+    monkeypatch.setattr(soectl, "load_env", lambda: None)
+    monkeypatch.setattr(soectl, "_which", _fake_which_factory({"kubectl": "/usr/bin/kubectl"}))
+    monkeypatch.setattr(soectl, "run", fake_run)
+    return kubeconfig, version_calls
+
+
+def test_doctor_reuses_cached_cluster_version(doctor_env, capsys: pytest.CaptureFixture[str]):
+    _, version_calls = doctor_env
+
+    soectl.doctor(refresh=False)
+    soectl.doctor(refresh=False)
+
+    assert version_calls == [["/usr/bin/kubectl", "version", "--short"]]
+    assert capsys.readouterr().out.count("Server Version: v1.30.0") == 2
+
+
+def test_doctor_queries_again_when_kubeconfig_changes(doctor_env):
+    kubeconfig, version_calls = doctor_env
+
+    soectl.doctor(refresh=False)
+    stat = kubeconfig.stat()
+    os.utime(kubeconfig, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    soectl.doctor(refresh=False)
+
+    assert len(version_calls) == 2
+
+
+def test_doctor_refresh_ignores_cache(doctor_env):
+    _, version_calls = doctor_env
+
+    soectl.doctor(refresh=False)
+    soectl.doctor(refresh=True)
+    soectl.doctor(refresh=False)
+
+    assert len(version_calls) == 2
+
+
+def test_up_applies_then_syncs_over_one_render(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    """``up`` ejecuta apply, resumen y pipeline con un único render del overlay."""
+
+    gitops = soectl._gitops()
+    manifest = "kind: ConfigMap\nmetadata:\n  name: demo\n  namespace: ns-demo\n"
+    renders: list[tuple[Path, bool]] = []
+    streamed: list[tuple[list[str], str | None]] = []
+
+    def fake_render(path: Path, use_kustomize: bool) -> str:
+        renders.append((path, use_kustomize))
+        return manifest
+
+    def fake_stream(self, args, *, input_data=None):
+        streamed.append((list(args), input_data))
+        return 0
+
+    monkeypatch.setattr(gitops, "render_manifests", fake_render)
+    monkeypatch.setattr(gitops.KubectlRunner, "stream", fake_stream)
+    monkeypatch.setattr(soectl, "load_env", lambda: None)
+    monkeypatch.setattr(soectl, "_get_cluster_context", lambda: (None, None))
+    monkeypatch.setattr(soectl, "_which", _fake_which_factory({"kustomize": "/usr/bin/kustomize"}))
+    gitops.render_once.cache_clear()
+    try:
+        soectl.up(overlay="dev", prune=True, server_side=True)
+    finally:
+        gitops.render_once.cache_clear()
+
+    assert renders == [(Path(soectl.overlay_path("dev")), True)]
+    assert streamed == [
+        (["apply", "-f", "-", "--server-side"], manifest),
+        (["diff", "-f", "-"], manifest),
+        (["apply", "-f", "-", "--server-side"], manifest),
+        (
+            ["apply", "-f", "-", "--server-side", "--prune", "-l", "gitops-lite=managed"],
+            manifest,
+        ),
+    ]
+    assert "ns-demo: ConfigMap/demo" in capsys.readouterr().out
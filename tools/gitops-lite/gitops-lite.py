@@ -3,21 +3,31 @@
 from __future__ import annotations
 
 import argparse
+import functools
 import os
+import re
 import subprocess
 import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 try:
     import yaml  # type: ignore
 except ImportError as exc:  # pragma: no cover - dependency missing
     raise SystemExit("PyYAML is required: pip install pyyaml") from exc
 
+# libyaml-backed (C) loader/dumper when PyYAML was built with it.
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
 REQUIRED_LABELS = {
     "app.kubernetes.io/part-of": "soe-eda-runner",
     "gitops-lite": "managed",
 }
+REQUIRED_LABEL_ITEMS = tuple(REQUIRED_LABELS.items())
+STDIN_CHUNK_SIZE = 64 * 1024
 
 
 class KubectlRunner:
@@ -52,6 +62,33 @@ class KubectlRunner:
             raise SystemExit(proc.returncode)
         return proc
 
+    def stream(self, args: Iterable[str], *, input_data: Optional[str] = None) -> int:
+        """Run kubectl with stdout/stderr inherited and return its exit code.
+
+        Used where the output would only be echoed back: nothing is buffered
+        in Python and the manifest is fed to stdin in chunks.
+        """
+        cmd = self._base_cmd + list(args)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if input_data is not None else subprocess.DEVNULL,
+        )
+        if input_data is not None:
+            payload = memoryview(input_data.encode())
+            try:
+                for start in range(0, len(payload), STDIN_CHUNK_SIZE):
+                    proc.stdin.write(payload[start : start + STDIN_CHUNK_SIZE])
+            except BrokenPipeError:  # kubectl exited early; its stderr says why
+                pass
+            finally:
+                try:
+                    proc.stdin.close()
+                except BrokenPipeError:
+                    pass
+        return proc.wait()
+
 
 def read_file(path: Path) -> str:
     try:
@@ -74,16 +111,28 @@ def render_manifests(path: Path, use_kustomize: bool) -> str:
         return proc.stdout
 
     if path.is_dir():
-        manifests = []
-        for file_path in sorted(path.glob("*.y*ml")):
-            manifests.append(read_file(file_path))
-        if not manifests:
+        files = sorted(path.glob("*.y*ml"))
+        if not files:
             raise SystemExit(f"No manifest files found in directory: {path}")
+        # Reads release the GIL, so cold-cache open/read latency overlaps;
+        # executor.map keeps the sorted order.
+        with ThreadPoolExecutor(max_workers=min(32, len(files))) as executor:
+            manifests = list(executor.map(read_file, files))
         return "\n---\n".join(manifests)
 
     return read_file(path)
 
 
+@functools.lru_cache(maxsize=None)
+def render_once(path: str, use_kustomize: bool) -> str:
+    """Render ``path`` at most once per process.
+
+    Callers running several commands in-process (e.g. soectl up) share a
+    single kustomize build of the same overlay.
+    """
+    return render_manifests(Path(path), use_kustomize)
+
+
 def build_apply_args(args: argparse.Namespace, *, prune: bool) -> List[str]:
     apply_args = ["apply", "-f", "-"]
     if args.server_side:
@@ -102,34 +151,80 @@ def apply_manifest(
     *,
     prune: bool,
 ) -> None:
-    proc = kubectl.run(build_apply_args(args, prune=prune), input_data=manifest, check=False)
-    if proc.stdout:
-        print(proc.stdout, end="")
-    if proc.stderr:
-        print(proc.stderr, file=sys.stderr, end="")
-    if proc.returncode != 0:
-        raise SystemExit(proc.returncode)
+    returncode = kubectl.stream(build_apply_args(args, prune=prune), input_data=manifest)
+    if returncode != 0:
+        raise SystemExit(returncode)
 
 
 def prune_manifest(kubectl: KubectlRunner, manifest: str, args: argparse.Namespace) -> None:
-    proc = kubectl.run(
-        build_apply_args(args, prune=True), input_data=manifest, check=False
-    )
-    if proc.stdout:
-        print(proc.stdout, end="")
-    if proc.stderr:
-        print(proc.stderr, file=sys.stderr, end="")
-    if proc.returncode != 0:
-        raise SystemExit(proc.returncode)
+    returncode = kubectl.stream(build_apply_args(args, prune=True), input_data=manifest)
+    if returncode != 0:
+        raise SystemExit(returncode)
 
 
 def run_plan(kubectl: KubectlRunner, manifest: str) -> int:
+    return kubectl.stream(["diff", "-f", "-"], input_data=manifest)
+
+
+# kubectl diff names its temp files "<group>.<version>.<Kind>.<namespace>.<name>"
+# (the namespace is empty for cluster-scoped objects).
+DIFF_FILE_RE = re.compile(r"(?:^|\.)([A-Z][A-Za-z0-9]*)\.([a-z0-9-]*)\.(.+)$")
+EXISTING_JSONPATH = '{range .items[*]}{.kind}/{.metadata.name}{"\\n"}{end}'
+
+
+def changed_resources(kubectl: KubectlRunner, manifest: str) -> Set[Tuple[str, str, str]]:
+    """Run a single ``kubectl diff`` and return the (kind, namespace, name) it reports."""
+
     proc = kubectl.run(["diff", "-f", "-"], input_data=manifest, check=False)
-    if proc.stdout:
-        print(proc.stdout, end="")
-    if proc.stderr:
-        print(proc.stderr, file=sys.stderr, end="")
-    return proc.returncode
+    if proc.returncode not in (0, 1):
+        if proc.stderr:
+            print(proc.stderr, file=sys.stderr, end="")
+        raise SystemExit(proc.returncode)
+    changed: Set[Tuple[str, str, str]] = set()
+    for line in proc.stdout.splitlines():
+        if not line.startswith("+++ "):
+            continue
+        filename = os.path.basename(line[4:].split("\t", 1)[0].strip())
+        match = DIFF_FILE_RE.search(filename)
+        if match:
+            changed.add(match.groups())
+    return changed
+
+
+def existing_resources(
+    kubectl: KubectlRunner, namespace: Optional[str], kinds: Iterable[str]
+) -> Set[Tuple[str, str]]:
+    """Return the (kind, name) pairs of ``kinds`` present in ``namespace``.
+
+    One ``kubectl get`` covers every kind; if it fails (e.g. a CRD that is not
+    installed yet) the kinds are queried one by one so the others still count.
+    """
+
+    def get(kind_list: List[str]) -> subprocess.CompletedProcess[str]:
+        get_args = ["get", ",".join(kind_list), "--ignore-not-found"]
+        get_args.extend(["-o", f"jsonpath={EXISTING_JSONPATH}"])
+        if namespace:
+            get_args.extend(["-n", namespace])
+        return kubectl.run(get_args, check=False)
+
+    kinds = sorted(set(kinds))
+    procs = [get(kinds)]
+    if procs[0].returncode != 0 and len(kinds) > 1:
+        procs = [get([kind]) for kind in kinds]
+
+    existing: Set[Tuple[str, str]] = set()
+    for proc in procs:
+        if proc.returncode not in (0, 1):
+            if proc.stderr:
+                print(proc.stderr, file=sys.stderr, end="")
+            raise SystemExit(proc.returncode)
+        if proc.returncode != 0:
+            continue
+        for line in proc.stdout.splitlines():
+            kind, _, name = line.partition("/")
+            if name:
+                existing.add((kind, name))
+    return existing
 
 
 def summarize_status(kubectl: KubectlRunner, manifest_docs: Iterable[dict]) -> None:
@@ -140,6 +235,8 @@ def summarize_status(kubectl: KubectlRunner, manifest_docs: Iterable[dict]) -> N
 
     status_counts = {"Added": 0, "Changed": 0, "Same": 0}
 
+    named = []
+    kinds_by_namespace: Dict[Optional[str], Set[str]] = defaultdict(set)
     for resource in resources:
         metadata = resource.get("metadata", {})
         name = metadata.get("name")
@@ -147,26 +244,30 @@ def summarize_status(kubectl: KubectlRunner, manifest_docs: Iterable[dict]) -> N
         kind = resource.get("kind")
         if not name or not kind:
             continue
+        named.append((kind, namespace, name))
+        kinds_by_namespace[namespace].add(kind)
 
-        yaml_payload = yaml.safe_dump(resource, sort_keys=False)
-        diff_proc = kubectl.run(["diff", "-f", "-"], input_data=yaml_payload, check=False)
-        if diff_proc.returncode not in (0, 1):
-            if diff_proc.stderr:
-                print(diff_proc.stderr, file=sys.stderr, end="")
-            raise SystemExit(diff_proc.returncode)
-        exists = False
+    # One diff for the whole manifest and one get per namespace, instead of
+    # two kubectl processes per resource.
+    changed = changed_resources(
+        kubectl, yaml.dump_all(resources, Dumper=YAML_DUMPER, sort_keys=False)
+    )
+    existing = {
+        namespace: existing_resources(kubectl, namespace, kinds)
+        for namespace, kinds in kinds_by_namespace.items()
+    }
+
+    # Objects without metadata.namespace land in the context's namespace, so
+    # for those the diff is matched on kind and name alone.
+    changed_any_ns = {(kind, name) for kind, _, name in changed}
+    for kind, namespace, name in named:
+        exists = (kind, name) in existing[namespace]
         if namespace:
-            get_args = ["get", kind, name, "-n", namespace]
+            differs = (kind, namespace, name) in changed
         else:
-            get_args = ["get", kind, name]
-        get_proc = kubectl.run(get_args, check=False)
-        if get_proc.returncode not in (0, 1):
-            if get_proc.stderr:
-                print(get_proc.stderr, file=sys.stderr, end="")
-            raise SystemExit(get_proc.returncode)
-        exists = get_proc.returncode == 0
-
-        if diff_proc.returncode == 0 and exists:
+            differs = (kind, name) in changed_any_ns
+
+        if not differs and exists:
             status = "Same"
         elif not exists:
             status = "Added"
@@ -182,28 +283,30 @@ def summarize_status(kubectl: KubectlRunner, manifest_docs: Iterable[dict]) -> N
 
 def validate_labels(manifest_docs: Iterable[dict]) -> List[str]:
     errors: List[str] = []
-    for doc in manifest_docs:
-        if not isinstance(doc, dict):
-            continue
+    add_error = errors.append
+    for doc in [doc for doc in manifest_docs if isinstance(doc, dict)]:
         metadata = doc.get("metadata") or {}
-        name = metadata.get("name", "<unknown>")
         labels = metadata.get("labels") or {}
-        for key, expected in REQUIRED_LABELS.items():
-            value = labels.get(key)
-            if value != expected:
-                errors.append(
+        for key, expected in REQUIRED_LABEL_ITEMS:
+            if labels.get(key) != expected:
+                name = metadata.get("name", "<unknown>")
+                add_error(
                     f"Resource '{metadata.get('namespace', 'cluster')}/{name}' missing label {key}={expected}"
                 )
     return errors
 
 
+def load_documents(manifest: str) -> List[dict]:
+    return list(yaml.load_all(manifest, Loader=YAML_LOADER))
+
+
 def cmd_render(args: argparse.Namespace) -> None:
-    manifest = render_manifests(Path(args.path), args.kustomize)
+    manifest = render_once(args.path, args.kustomize)
     print(manifest, end="")
 
 
 def cmd_plan(args: argparse.Namespace) -> None:
-    manifest = render_manifests(Path(args.path), args.kustomize)
+    manifest = render_once(args.path, args.kustomize)
     kubectl = KubectlRunner(args.kube_bin, args.context, args.kubeconfig)
     exit_code = run_plan(kubectl, manifest)
     if exit_code not in (0, 1):
@@ -211,35 +314,62 @@ def cmd_plan(args: argparse.Namespace) -> None:
 
 
 def cmd_status(args: argparse.Namespace) -> None:
-    manifest = render_manifests(Path(args.path), args.kustomize)
-    docs = list(yaml.safe_load_all(manifest))
+    manifest = render_once(args.path, args.kustomize)
+    docs = load_documents(manifest)
     kubectl = KubectlRunner(args.kube_bin, args.context, args.kubeconfig)
     summarize_status(kubectl, docs)
 
 
 def cmd_apply(args: argparse.Namespace) -> None:
-    manifest = render_manifests(Path(args.path), args.kustomize)
+    manifest = render_once(args.path, args.kustomize)
     kubectl = KubectlRunner(args.kube_bin, args.context, args.kubeconfig)
     apply_manifest(kubectl, manifest, args, prune=args.enable_prune)
 
 
 def cmd_prune(args: argparse.Namespace) -> None:
-    manifest = render_manifests(Path(args.path), args.kustomize)
+    manifest = render_once(args.path, args.kustomize)
     kubectl = KubectlRunner(args.kube_bin, args.context, args.kubeconfig)
     prune_manifest(kubectl, manifest, args)
 
 
 def cmd_sync(args: argparse.Namespace) -> None:
-    manifest = render_manifests(Path(args.path), args.kustomize)
+    manifest = render_once(args.path, args.kustomize)
     kubectl = KubectlRunner(args.kube_bin, args.context, args.kubeconfig)
     apply_manifest(kubectl, manifest, args, prune=False)
     if args.enable_prune:
         prune_manifest(kubectl, manifest, args)
 
 
+def cmd_pipeline(args: argparse.Namespace) -> None:
+    """Run plan, apply and prune in one process over a single rendered manifest.
+
+    The plan is an advisory preview: ``kubectl diff`` can fail where apply
+    succeeds (a CRD shipped with its custom resources, a namespace created by
+    the same manifest, RBAC without dry-run), so a failed diff is reported and
+    the pipeline carries on.  A failing apply or prune stops it.
+    """
+    manifest = render_once(args.path, args.kustomize)
+    kubectl = KubectlRunner(args.kube_bin, args.context, args.kubeconfig)
+    if args.plan:
+        print("==> plan", flush=True)
+        exit_code = run_plan(kubectl, manifest)
+        if exit_code not in (0, 1):
+            print(
+                f"warning: plan failed (kubectl diff exit {exit_code}); continuing",
+                file=sys.stderr,
+                flush=True,
+            )
+    if args.apply:
+        print("==> apply", flush=True)
+        apply_manifest(kubectl, manifest, args, prune=False)
+    if args.prune:
+        print("==> prune", flush=True)
+        prune_manifest(kubectl, manifest, args)
+
+
 def cmd_validate(args: argparse.Namespace) -> None:
-    manifest = render_manifests(Path(args.path), args.kustomize)
-    docs = list(yaml.safe_load_all(manifest))
+    manifest = render_once(args.path, args.kustomize)
+    docs = load_documents(manifest)
     label_errors = validate_labels(docs)
     if label_errors:
         for err in label_errors:
@@ -247,13 +377,9 @@ def cmd_validate(args: argparse.Namespace) -> None:
         raise SystemExit(1)
 
     kubectl = KubectlRunner(args.kube_bin, args.context, args.kubeconfig)
-    proc = kubectl.run(["apply", "--dry-run=server", "-f", "-"], input_data=manifest, check=False)
-    if proc.stdout:
-        print(proc.stdout, end="")
-    if proc.stderr:
-        print(proc.stderr, file=sys.stderr, end="")
-    if proc.returncode != 0:
-        raise SystemExit(proc.returncode)
+    returncode = kubectl.stream(["apply", "--dry-run=server", "-f", "-"], input_data=manifest)
+    if returncode != 0:
+        raise SystemExit(returncode)
 
 
 def add_common_arguments(parser: argparse.ArgumentParser) -> None:
@@ -303,6 +429,17 @@ def build_parser() -> argparse.ArgumentParser:
     add_common_arguments(sync_parser)
     sync_parser.set_defaults(func=cmd_sync)
 
+    pipeline_parser = subparsers.add_parser(
+        "pipeline", help="Plan, apply and/or prune in a single invocation"
+    )
+    add_common_arguments(pipeline_parser)
+    pipeline_parser.add_argument("--plan", action="store_true", help="Show the diff first")
+    pipeline_parser.add_argument("--apply", action="store_true", help="Apply the manifests")
+    pipeline_parser.add_argument(
+        "--prune", action="store_true", help="Prune managed resources (requires --selector)"
+    )
+    pipeline_parser.set_defaults(func=cmd_pipeline)
+
     validate_parser = subparsers.add_parser("validate", help="Validate manifests and labels")
     add_common_arguments(validate_parser)
     validate_parser.set_defaults(func=cmd_validate)
@@ -310,11 +447,19 @@ def build_parser() -> argparse.ArgumentParser:
     return parser
 
 
-def main(argv: Optional[List[str]] = None) -> None:
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point; returns the exit code so it can also be called in-process."""
     parser = build_parser()
     args = parser.parse_args(argv)
-    args.func(args)
+    try:
+        args.func(args)
+    except SystemExit as exc:
+        if exc.code is None or isinstance(exc.code, int):
+            return exc.code or 0
+        print(exc.code, file=sys.stderr)
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
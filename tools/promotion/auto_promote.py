@@ -3,24 +3,33 @@
 
 from __future__ import annotations
 
+import functools
 import json
 import os
 import re
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 from urllib.parse import urlparse
 
 import yaml
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
 
 POLICY_PATH = Path("ml/policies/promotion.yaml")
 DEFAULT_POLICY = {
     "thresholds": {"r2_min_gain": 0.01, "rmse_min_drop": 100},
     "actions": {"auto_promote": True, "target_overlay": "dev"},
 }
+# One pass over the configmap rewrites every model setting we manage.
+CONFIGMAP_VALUE_RE = re.compile(r'(MODEL_PATH|MODEL_FORMAT|MODEL_META_PATH)(:\s*)".*?"')
 
 
 def load_policy() -> Dict[str, Dict[str, object]]:
@@ -70,35 +79,71 @@ def overlay_configmap(overlay_path: Path) -> Path:
     return overlay_path / "kustomization.yaml"
 
 
-def update_configmap(path: Path, model_uri: str, model_format: str, metadata_uri: str | None) -> None:
+def render_configmap(path: Path, values: Dict[str, str]) -> str:
     text = path.read_text(encoding="utf-8")
-    updated = text
-    if "MODEL_PATH" in text:
-        updated = re.sub(r'(MODEL_PATH:\s*)".*?"', rf'\1"{model_uri}"', updated)
-    if "MODEL_FORMAT" in updated:
-        updated = re.sub(r'(MODEL_FORMAT:\s*)".*?"', rf'\1"{model_format}"', updated)
-    if metadata_uri and "MODEL_META_PATH" in updated:
-        updated = re.sub(r'(MODEL_META_PATH:\s*)".*?"', rf'\1"{metadata_uri}"', updated)
+
+    def replace(match: re.Match[str]) -> str:
+        key = match.group(1)
+        if key not in values:
+            return match.group(0)
+        return f'{key}{match.group(2)}"{values[key]}"'
+
+    updated = CONFIGMAP_VALUE_RE.sub(replace, text)
 
     if updated == text:
         raise RuntimeError(f"Unable to update MODEL_PATH in {path}")
+    return updated
+
+
+def update_configmaps(
+    paths: List[Path], model_uri: str, model_format: str, metadata_uri: str | None
+) -> None:
+    """Point every configmap in ``paths`` at the new model and stage them.
+
+    All files are rewritten in memory before any is written, so a configmap
+    that cannot be updated leaves the others untouched; staging is one
+    ``git add`` for the whole batch.
+    """
+    values = {"MODEL_PATH": model_uri, "MODEL_FORMAT": model_format}
+    if metadata_uri:
+        values["MODEL_META_PATH"] = metadata_uri
 
-    path.write_text(updated, encoding="utf-8")
-    subprocess.check_call(["git", "add", str(path)])
+    def write(path: Path, text: str) -> None:
+        path.write_text(text, encoding="utf-8")
+
+    with ThreadPoolExecutor(max_workers=min(8, len(paths)) or 1) as executor:
+        rendered = list(executor.map(render_configmap, paths, [values] * len(paths)))
+        list(executor.map(write, paths, rendered))
+    subprocess.check_call(["git", "add", "--", *(str(path) for path in paths)])
 
 
 def ensure_git_identity() -> None:
-    try:
-        subprocess.check_call(["git", "config", "user.name"])
-        subprocess.check_call(["git", "config", "user.email"])
-    except subprocess.CalledProcessError:
-        subprocess.check_call(["git", "config", "user.name", os.getenv("GIT_AUTHOR_NAME", "ci-bot")])
-        subprocess.check_call([
-            "git",
-            "config",
-            "user.email",
-            os.getenv("GIT_AUTHOR_EMAIL", "ci-bot@example.com"),
-        ])
+    # A single `git config --list -z` replaces probing each key separately;
+    # with -z every entry is "<key>\n<value>" and entries are NUL separated.
+    listing = subprocess.run(
+        ["git", "config", "--list", "-z"], capture_output=True, text=True, check=False
+    ).stdout
+    configured = {entry.split("\n", 1)[0] for entry in listing.split("\0") if entry}
+    defaults = {
+        "user.name": os.getenv("GIT_AUTHOR_NAME", "ci-bot"),
+        "user.email": os.getenv("GIT_AUTHOR_EMAIL", "ci-bot@example.com"),
+    }
+    for key, value in defaults.items():
+        if key not in configured:
+            subprocess.check_call(["git", "config", key, value])
+
+
+@functools.lru_cache(maxsize=1)
+def _get_s3_client():
+    """Build the S3 client once; botocore model loading dominates its cost."""
+    import boto3
+
+    session = boto3.session.Session(
+        aws_access_key_id=os.getenv("S3_ACCESS_KEY"),
+        aws_secret_access_key=os.getenv("S3_SECRET_KEY"),
+        region_name=os.getenv("AWS_REGION", os.getenv("S3_REGION", "us-east-1")),
+    )
+    return session.client("s3", endpoint_url=os.getenv("S3_ENDPOINT"))
 
 
 def record_promotion(model_uri: str, overlay: str, reasons: Tuple[str, ...], actor: str) -> None:
@@ -120,24 +165,23 @@ def record_promotion(model_uri: str, overlay: str, reasons: Tuple[str, ...], act
     }
 
     try:
-        import boto3
         from botocore.exceptions import BotoCoreError, ClientError
+
+        client = _get_s3_client()
     except Exception as exc:  # pragma: no cover
         print(f"[promotion] boto3 unavailable, skipping promotion.json upload ({exc})")
         return
 
-    session = boto3.session.Session(
-        aws_access_key_id=os.getenv("S3_ACCESS_KEY"),
-        aws_secret_access_key=os.getenv("S3_SECRET_KEY"),
-        region_name=os.getenv("AWS_REGION", os.getenv("S3_REGION", "us-east-1")),
-    )
-    client = session.client("s3", endpoint_url=os.getenv("S3_ENDPOINT"))
+    if orjson is not None:
+        body = orjson.dumps(payload, option=orjson.OPT_INDENT_2)
+    else:
+        body = json.dumps(payload, indent=2).encode("utf-8")
 
     try:
         client.put_object(
             Bucket=parsed.netloc,
             Key=promotion_key,
-            Body=json.dumps(payload, indent=2).encode("utf-8"),
+            Body=body,
             ContentType="application/json",
         )
         print(f"[promotion] promotion.json stored at s3://{parsed.netloc}/{promotion_key}")
@@ -170,7 +214,7 @@ def main() -> None:
 
     configmap_path = overlay_configmap(overlay_path)
     model_format = "onnx" if model_uri.lower().endswith(".onnx") else "pkl"
-    update_configmap(configmap_path, model_uri, model_format, metadata_uri)
+    update_configmaps([configmap_path], model_uri, model_format, metadata_uri)
 
     ensure_git_identity()
     message = f"chore: promote model -> {model_uri}"
@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
-import json
+import collections
+import functools
+import importlib.util
 import os
 import shutil
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import inspect
 
 try:
     import click
@@ -26,13 +28,16 @@ except ModuleNotFoundError as exc:  # pragma: no cover - defensive guard
         f"Ejecuta: {install_hint}\n"
     )
     raise SystemExit(1) from exc
-import yaml  # noqa: F401  # reservado para futuras lecturas de config
-from dotenv import load_dotenv
+# typer ya importa rich; solo dotenv y yaml se cargan bajo demanda.
 from rich.console import Console
-
-if click is not None:  # pragma: no branch - simple compatibility shim
-    signature = inspect.signature(click.Parameter.make_metavar)
-    if len(signature.parameters) == 2:
+from rich.markup import escape
+
+if click is not None and not getattr(
+    click.Parameter.make_metavar, "_soe_patched", False
+):  # pragma: no branch - simple compatibility shim
+    # co_argcount es una lectura de atributo; inspect.signature construye un
+    # Signature completo en cada arranque.
+    if click.Parameter.make_metavar.__code__.co_argcount == 2:
         original_make_metavar = click.Parameter.make_metavar
 
         def _patched_make_metavar(self, ctx=None):  # type: ignore[override]
@@ -40,24 +45,78 @@ if click is not None:  # pragma: no branch - simple compatibility shim
                 ctx = click.Context(click.Command(self.name or ""))
             return original_make_metavar(self, ctx)
 
+        _patched_make_metavar._soe_patched = True  # type: ignore[attr-defined]
         click.Parameter.make_metavar = _patched_make_metavar  # type: ignore[assignment]
 
 app = typer.Typer(help="SOE EDA Runner - utilitario de instalación y operación")
 console = Console()
-ROOT = Path(__file__).resolve().parents[2]
+# La estructura del repo es fija: tools/soectl/soectl.py -> raíz dos niveles arriba.
+# abspath evita el recorrido de realpath que hace Path.resolve() en cada arranque.
+ROOT = Path(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 GITOPS = ROOT / "tools" / "gitops-lite" / "gitops-lite.py"
+GITOPS_STR = str(GITOPS)
+OVERLAYS_DIR_STR = os.path.join(str(ROOT), "deploy-gitops", "overlays")
+ENV_FILE = ROOT / ".env"
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")) / "soectl"
+CLUSTER_VERSION_CACHE = CACHE_DIR / "cluster_version.json"
+
+
+def overlay_path(overlay: str) -> str:
+    """Ruta (como texto) del overlay indicado dentro de deploy-gitops/overlays.
+
+    Solo se entrega a subprocesos o se imprime, así que basta con os.path.join.
+    """
+
+    return os.path.join(OVERLAYS_DIR_STR, overlay)
+
+
+@functools.lru_cache(maxsize=None)
+def _probe(name: str) -> str | None:
+    """``shutil.which`` memoizado: cada binario se busca en PATH una sola vez."""
+
+    return shutil.which(name)
 
 
 def _which(*candidates: str) -> str | None:
     """Devuelve el primer ejecutable disponible en la lista de candidatos."""
 
     for candidate in candidates:
-        path = shutil.which(candidate)
+        path = _probe(candidate)
         if path:
             return path
     return None
 
 
+class Preflight:
+    """Herramientas disponibles y overlays presentes en el repositorio.
+
+    Cada comprobación se hace la primera vez que se consulta, así quien falla
+    pronto (p. ej. un overlay mal escrito) no paga las búsquedas en PATH.
+    """
+
+    @functools.cached_property
+    def overlays(self) -> frozenset[str]:
+        # Un opendir en vez de un stat por overlay consultado.
+        try:
+            with os.scandir(OVERLAYS_DIR_STR) as entries:
+                return frozenset(entry.name for entry in entries if entry.is_dir())
+        except FileNotFoundError:
+            return frozenset()
+
+    @functools.cached_property
+    def kube_client(self) -> str | None:
+        return _which("kubectl", "oc")
+
+    @functools.cached_property
+    def has_kustomize(self) -> bool:
+        return _which("kustomize") is not None
+
+
+@functools.lru_cache(maxsize=1)
+def _preflight() -> Preflight:
+    return Preflight()
+
+
 def _get_cluster_context() -> tuple[str | None, str | None]:
     """Obtiene contexto y endpoint del clúster actual si kubectl/oc están disponibles."""
 
@@ -81,7 +140,7 @@ def _get_cluster_context() -> tuple[str | None, str | None]:
     return context, server
 
 
-def _render_kustomize(path: Path) -> str | None:
+def _render_kustomize(path: str | Path) -> str | None:
     """Renderiza manifiestos usando kustomize o kubectl/oc como fallback."""
 
     kustomize = _which("kustomize")
@@ -108,13 +167,30 @@ def _render_kustomize(path: Path) -> str | None:
     return output
 
 
-def _summarize_rendered_resources(path: Path) -> dict[str, list[str]]:
+def _render_overlay(path: str | Path) -> str | None:
+    """Renderiza el overlay reutilizando el build de gitops-lite si hay kustomize.
+
+    ``render_once`` guarda el resultado en este proceso, así el resumen, el
+    cleanup y los pasos de gitops-lite comparten un solo ``kustomize build``.
+    """
+
+    if _which("kustomize") and GITOPS.exists():
+        try:
+            return _gitops().render_once(str(path), True).strip() or None
+        except SystemExit:
+            return None  # gitops-lite ya informó el error por stderr
+    return _render_kustomize(path)
+
+
+def _summarize_rendered_resources(path: str | Path) -> dict[str, list[str]]:
     """Construye el overlay y devuelve un resumen agrupado por namespace."""
 
-    rendered = _render_kustomize(path)
+    rendered = _render_overlay(path)
     if not rendered:
         return {}
 
+    import yaml
+
     summary: dict[str, list[str]] = {}
     for resource in yaml.safe_load_all(rendered):
         if not isinstance(resource, dict):
@@ -129,9 +205,24 @@ def _summarize_rendered_resources(path: Path) -> dict[str, list[str]]:
     return summary
 
 
-def run(cmd, check=True, env=None, input=None):
-    """Ejecuta un comando y gestiona errores con salida rica."""
-    result = subprocess.run(cmd, text=True, capture_output=True, env=env, input=input)
+# Resultado mínimo de run(): stdout/stderr son None cuando la salida va a la terminal.
+Result = collections.namedtuple("Result", "returncode stdout stderr")
+
+
+def run(cmd, check=True, env=None, input=None, capture=False):
+    """Ejecuta un comando y gestiona errores con salida rica.
+
+    Por defecto la salida del proceso va directo a la terminal; ``capture=True``
+    la almacena para quien necesite inspeccionarla (y la reimprime si falla).
+    """
+    if capture:
+        completed = subprocess.run(cmd, text=True, capture_output=True, env=env, input=input)
+        result = Result(completed.returncode, completed.stdout, completed.stderr)
+    else:
+        stdin = subprocess.PIPE if input is not None else None
+        with subprocess.Popen(cmd, text=True, env=env, stdin=stdin) as proc:
+            proc.communicate(input)
+        result = Result(proc.returncode, None, None)
     if check and result.returncode != 0:
         if result.stdout:
             console.print(result.stdout)
@@ -141,14 +232,49 @@ def run(cmd, check=True, env=None, input=None):
     return result
 
 
+@functools.lru_cache(maxsize=1)
+def _gitops():
+    """Importa gitops-lite como módulo (una sola vez) para no relanzar Python."""
+
+    spec = importlib.util.spec_from_file_location("gitops_lite", GITOPS_STR)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore[union-attr]
+    return module
+
+
+def run_gitops(args: list[str]) -> None:
+    """Ejecuta gitops-lite en el mismo proceso y corta con su código si falla."""
+
+    if not GITOPS.exists():
+        console.print(f"[red]gitops-lite no encontrado: {GITOPS_STR}[/red]")
+        raise typer.Exit(1)
+    try:
+        returncode = _gitops().main(args)
+    except FileNotFoundError as exc:
+        console.print(f"[red]Ejecutable no encontrado: {exc.filename}[/red]")
+        returncode = 127
+    if returncode != 0:
+        raise typer.Exit(returncode)
+
+
+@functools.lru_cache(maxsize=1)
 def load_env():
-    """Carga variables desde .env si existe."""
-    env_file = ROOT / ".env"
-    if env_file.exists():
-        load_dotenv(env_file)
+    """Carga variables desde .env si existe (una sola vez por proceso)."""
+    if ENV_FILE.exists():
+        from dotenv import load_dotenv
+
+        # override=False: repetir la carga no pisa variables ya definidas.
+        load_dotenv(ENV_FILE, override=False)
         console.print("[green]Cargado .env[/green]")
 
 
+@functools.lru_cache(maxsize=1)
+def _repo_slug() -> str | None:
+    """REPO_SLUG leído una vez, después de cargar .env."""
+    load_env()
+    return os.getenv("REPO_SLUG")
+
+
 @app.command()
 def init(
     overlay: str = typer.Option(
@@ -160,16 +286,18 @@ def init(
 ):
     """Validaciones básicas y presencia de kustomize/overlay."""
     load_env()
-    if not shutil.which("kubectl") and not shutil.which("oc"):
+    preflight = _preflight()
+    path = overlay_path(overlay)
+    # Primero lo barato: un overlay inexistente falla sin recorrer PATH.
+    if overlay not in preflight.overlays:
+        console.print(f"[red]Overlay no existe: {path}[/red]")
+        raise typer.Exit(1)
+    if not preflight.kube_client:
         console.print("[red]kubectl u oc no encontrados[/red]")
         raise typer.Exit(1)
-    if not shutil.which("kustomize"):
+    if not preflight.has_kustomize:
         console.print("[yellow]kustomize no encontrado[/yellow]")
         raise typer.Exit(1)
-    path = ROOT / "deploy-gitops" / "overlays" / overlay
-    if not path.exists():
-        console.print(f"[red]Overlay no existe: {path}[/red]")
-        raise typer.Exit(1)
     console.print(f"[green]Overlay listo:[/green] {path}")
 
 
@@ -186,12 +314,11 @@ def bootstrap(
 ):
     """Aplica recursos base (ns, rbac, pvc, cm, secrets) en el overlay indicado."""
     load_env()
-    path = ROOT / "deploy-gitops" / "overlays" / overlay
+    path = overlay_path(overlay)
     console.print(f"[cyan]Bootstrap {overlay}[/cyan]")
-    cmd = [sys.executable, str(GITOPS), "apply", "--path", str(path), "--kustomize"]
-    if server_side:
-        cmd += ["--server-side"]
-    run(cmd, check=False)
+    run_gitops(
+        ["apply", "--path", path, "--kustomize", *(("--server-side",) if server_side else ())]
+    )
 
 
 @app.command()
@@ -220,7 +347,7 @@ def sync(
 ):
     """Sincroniza estado declarativo (cleanup opcional → plan → apply [+ prune])."""
     load_env()
-    path = ROOT / "deploy-gitops" / "overlays" / overlay
+    path = overlay_path(overlay)
     context, server = _get_cluster_context()
     if context or server:
         console.print("[blue]Contexto activo:[/blue]" + (f" {context}" if context else " desconocido"))
@@ -238,7 +365,7 @@ def sync(
         )
     if cleanup:
         console.print(f"[cyan]Cleanup ({overlay})[/cyan]")
-        manifest = _render_kustomize(path)
+        manifest = _render_overlay(path)
         if not manifest:
             console.print(
                 "[yellow]No se pudo renderizar el overlay para cleanup; omitiendo eliminación previa.[/yellow]"
@@ -253,30 +380,23 @@ def sync(
                 check=False,
                 input=manifest,
             )
-    console.print(f"[cyan]Plan ({overlay})[/cyan]")
-    run(
-        [sys.executable, str(GITOPS), "plan", "--path", str(path), "--kustomize"],
-        check=False,
-    )
-    console.print(f"[cyan]Apply ({overlay})[/cyan]")
-    cmd = [sys.executable, str(GITOPS), "apply", "--path", str(path), "--kustomize"]
-    if server_side:
-        cmd += ["--server-side"]
-    run(cmd, check=False)
-    if prune:
-        console.print(f"[cyan]Prune ({overlay})[/cyan]")
-        prune_cmd = [
-            sys.executable,
-            str(GITOPS),
-            "prune",
+    # Una sola llamada a gitops-lite (en este mismo proceso) hace plan → apply
+    # [→ prune] sobre el mismo render, en vez de un intérprete y un kustomize
+    # build por paso.
+    steps = "Plan → Apply" + (" → Prune" if prune else "")
+    console.print(f"[cyan]{steps} ({overlay})[/cyan]")
+    run_gitops(
+        [
+            "pipeline",
             "--path",
-            str(path),
+            path,
             "--kustomize",
+            "--plan",
+            "--apply",
+            *(("--server-side",) if server_side else ()),
+            *(("--prune", "--selector", "gitops-lite=managed") if prune else ()),
         ]
-        if server_side:
-            prune_cmd.append("--server-side")
-        prune_cmd += ["--selector", "gitops-lite=managed"]
-        run(prune_cmd, check=False)
+    )
     console.print("[green]Sync OK[/green]")
     if resources:
         console.print(
@@ -284,6 +404,47 @@ def sync(
         )
 
 
+@app.command()
+def up(
+    overlay: str = typer.Option("dev", "--overlay", "-o"),
+    prune: bool = typer.Option(
+        False,
+        "--prune",
+        "--no-prune",
+        help="Eliminar recursos ausentes tras aplicar",
+        show_default=True,
+    ),
+    server_side: bool = typer.Option(
+        True,
+        "--server-side",
+        "--no-server-side",
+        help="Usar server-side apply",
+        show_default=True,
+    ),
+):
+    """Bootstrap y sync del overlay en un solo proceso."""
+    # Mismo intérprete, una sola carga de .env y gitops-lite reutiliza el
+    # render del overlay (render_once) entre el apply del bootstrap y el sync.
+    bootstrap(overlay=overlay, server_side=server_side)
+    sync(overlay=overlay, prune=prune, server_side=server_side, cleanup=False)
+
+
+def _dotenv_quote(value: str) -> str:
+    """Entrecomilla un valor para un env-file (gh usa la sintaxis de godotenv).
+
+    Entre comillas dobles godotenv expande ``$VAR``/``${VAR}``; ``\\$`` lo evita.
+    """
+
+    escaped = (
+        value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("$", "\\$")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+    return f'"{escaped}"'
+
+
 @app.command()
 def secrets(
     env: str = typer.Option("dev", "--env", "-e"),
@@ -297,47 +458,132 @@ def secrets(
 ):  # noqa: ARG001
     """Configura secrets en GitHub desde variables .env o ambiente actual."""
     load_env()
-    repo = os.getenv("REPO_SLUG")
+    repo = _repo_slug()
     if not repo:
         console.print("[red]Define REPO_SLUG en .env[/red]")
         raise typer.Exit(1)
-    gh = shutil.which("gh")
+    gh = _which("gh")
     if not gh:
         console.print("[red]Instala GitHub CLI (gh)[/red]")
         raise typer.Exit(1)
 
     if env == "dev":
+        lines = []
         for key in ("K8S_SERVER_DEV", "K8S_TOKEN_DEV"):
             value = os.getenv(key)
             if not value:
                 console.print(f"[yellow]Advertencia: {key} vacío[/yellow]")
-            run(
-                [gh, "secret", "set", key, "--repo", repo, "--body", value or ""],
-                check=False,
-            )
+            lines.append(f"{key}={_dotenv_quote(value or '')}")
+        # Un solo proceso gh carga todos los secretos desde un env-file por stdin.
+        run(
+            [gh, "secret", "set", "--repo", repo, "--env-file", "-"],
+            check=False,
+            input="\n".join(lines) + "\n",
+        )
     console.print("[green]Secrets configurados[/green]")
 
 
+def _kubeconfig_stamp() -> tuple[str, int] | None:
+    """Kubeconfig activo y su mtime (ns); None si no hay archivo que vigilar."""
+
+    kubeconfig = (os.environ.get("KUBECONFIG") or "").split(os.pathsep)[0]
+    kubeconfig = kubeconfig or os.path.expanduser("~/.kube/config")
+    try:
+        return kubeconfig, os.stat(kubeconfig).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_cached_version(client: str, stamp: tuple[str, int]) -> Result | None:
+    """Versión guardada si sigue vigente para este cliente y kubeconfig."""
+
+    import json
+
+    try:
+        with open(CLUSTER_VERSION_CACHE, encoding="utf-8") as handle:
+            cached = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(cached, dict)
+        or cached.get("client") != client
+        or [cached.get("kubeconfig"), cached.get("mtime_ns")] != list(stamp)
+    ):
+        return None
+    return Result(0, cached.get("stdout") or "", cached.get("stderr") or "")
+
+
+def _write_cached_version(client: str, stamp: tuple[str, int], result: Result) -> None:
+    import json
+
+    payload = {
+        "client": client,
+        "kubeconfig": stamp[0],
+        "mtime_ns": stamp[1],
+        "stdout": result.stdout,
+        "stderr": result.stderr,
+    }
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = CLUSTER_VERSION_CACHE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp, CLUSTER_VERSION_CACHE)
+    except OSError:
+        pass  # la caché es opcional; doctor sigue funcionando sin ella
+
+
 @app.command()
-def doctor():
+def doctor(
+    refresh: bool = typer.Option(
+        False,
+        "--refresh",
+        help="Ignorar la versión del clúster en caché y consultarla de nuevo",
+        show_default=True,
+    ),
+):
     """Diagnóstico básico del entorno (CLI, cluster, overlays)."""
     load_env()
 
-    def ok(cmd_name: str) -> bool:
-        return shutil.which(cmd_name) is not None
-
-    checks = {
-        "python": ok("python3"),
-        "kubectl_or_oc": ok("kubectl") or ok("oc"),
-        "kustomize": ok("kustomize"),
-        "git": ok("git"),
+    probes = {
+        "python": ("python3",),
+        "kubectl_or_oc": ("kubectl", "oc"),
+        "kustomize": ("kustomize",),
+        "git": ("git",),
     }
-    console.print(json.dumps(checks, indent=2))
-    try:
-        run(["kubectl", "version", "--short"], check=False)
-    except Exception:  # pragma: no cover - fallback manual
-        if shutil.which("oc"):
-            run(["oc", "version"], check=False)
+
+    def cluster_version():
+        client = _which("kubectl", "oc")
+        if not client:
+            return None
+        # Mientras el kubeconfig no cambie (un stat), la versión guardada evita
+        # la ida y vuelta al API server.
+        stamp = _kubeconfig_stamp()
+        if stamp is not None and not refresh:
+            cached = _read_cached_version(client, stamp)
+            if cached is not None:
+                return cached
+        is_oc = os.path.basename(client) == "oc"
+        cmd = [client, "version"] if is_oc else [client, "version", "--short"]
+        result = run(cmd, check=False, capture=True)
+        if stamp is not None and result.returncode == 0:
+            _write_cached_version(client, stamp, result)
+        return result
+
+    # Las búsquedas en PATH y la consulta de versión (ida y vuelta al API
+    # server) son independientes: se lanzan a la vez.
+    with ThreadPoolExecutor(max_workers=len(probes) + 1) as executor:
+        version = executor.submit(cluster_version)
+        found = {
+            name: executor.submit(_which, *candidates) for name, candidates in probes.items()
+        }
+        checks = {name: future.result() is not None for name, future in found.items()}
+        console.print_json(data=checks)
+        result = version.result()
+    if result is not None:
+        if result.stdout:
+            console.print(result.stdout, end="", markup=False, highlight=False)
+        if result.stderr:
+            console.print(f"[red]{escape(result.stderr)}[/red]", end="")
     console.print("[green]Doctor finalizado[/green]")
 
 